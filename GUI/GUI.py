@@ -1,23 +1,40 @@
+import contextlib
 import datetime
+import functools
+import hashlib
+import io
 import json
 import logging
 import os
+import re
 import threading
 import time
 import typing
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import numpy as np
-import pygame
 import serial
 # noinspection PyUnresolvedReferences
 from PyQt5 import uic
-from PyQt5.QtCore import QTimer, QRect, QModelIndex, QDate, QStringListModel, QSize
+from PyQt5.QtCore import (
+    QTimer,
+    QRect,
+    QDate,
+    QStringListModel,
+    QSize,
+    pyqtSignal,
+    QThread,
+    QSignalBlocker,
+    QEventLoop,
+)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon, QCursor, QFont, QCloseEvent
+from PyQt5.QtGui import QIcon, QCursor, QFont, QCloseEvent, QPalette, QColor
 from PyQt5.QtWidgets import (
     QWidget,
     QVBoxLayout,
+    QHBoxLayout,
+    QLayout,
     QLabel,
     QDialog,
     QDoubleSpinBox,
@@ -43,25 +60,125 @@ from PyQt5.QtWidgets import (
     QMessageBox,
     QMainWindow,
     QProgressBar,
+    QProgressDialog,
     QFrame,
 )
 
-from GUI.Models import DrugTableModel
+from GUI.Models import DrugTableModel, CachedTextDelegate
+from GUI.sounds import load_sound, reserve_channel
 from GUI.scope import ScopeLayoutWidget, PagedScope, ScrollingScope, vline_color_iterator
 from misc import Drug, Sex, Subject, LogBox
 from pumps import SyringePumps
-from pumps.SyringePumps import SyringePumpException, AVAIL_PUMP_MODULES, SyringePump
+from pumps.SyringePumps import SyringePumpException, AVAIL_PUMP_MODULES, SyringePump, CachedPump
 
 # noinspection SpellCheckingInspection
 from sampling import AVAIL_ACQ_MODULES
 
-# if it hasn't been already, initialize the sound mixer
-if pygame.mixer.get_init() is None:
-    pygame.mixer.pre_init(44100, -16, 2, 2048)
-    pygame.mixer.init()
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    _json_loads = orjson.loads
+except ModuleNotFoundError:
+    # orjson is optional: fall back on the standard library, with a compact output
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+
+_RE_RC_IMPORT = re.compile(r"^import \w+_rc$")
+
+
+@functools.lru_cache(maxsize=None)
+def _ui_form_class(path):
+    """
+    compiles the .ui file at path to python code the first time it is requested, and returns the generated form class,
+    so that the XML only gets parsed once, no matter how many widgets are built from it.
+    Like uic.loadUi, the compiled resource modules referenced by the file are not imported.
+    """
+    code = io.StringIO()
+    uic.compileUi(path, code)
+    source = "\n".join(
+        line for line in code.getvalue().splitlines() if not _RE_RC_IMPORT.match(line)
+    )
+    namespace = {}
+    exec(compile(source, path, "exec"), namespace)
+    return next(obj for name, obj in namespace.items() if name.startswith("Ui_"))
+
+
+def load_ui(path, widget):
+    """
+    same as uic.loadUi(path, widget), using the cached form class: the child widgets are created in widget and
+    made available as attributes of widget
+    """
+    form = _ui_form_class(path)()
+    form.setupUi(widget)
+    for name, obj in vars(form).items():
+        setattr(widget, name, obj)
+
+
+@functools.lru_cache(maxsize=None)
+def _icon(path_off, path_on=None):
+    """
+    returns a QIcon built from the given image file(s), with an optional second image for the "On" state.
+    The icon is shared between all the callers, so the images are only decoded once
+    """
+    ico = QIcon()
+    ico.addFile(path_off, state=QIcon.Off)
+    if path_on is not None:
+        ico.addFile(path_on, state=QIcon.On)
+    return ico
+
+
+@functools.lru_cache(maxsize=None)
+def _standard_icon(standard_pixmap: QStyle.StandardPixmap):
+    """
+    returns the application style's standard icon, only asking the style for it the first time
+    """
+    return QApplication.style().standardIcon(standard_pixmap)
+
+
+@functools.lru_cache(maxsize=None)
+def _units_model(units: typing.Tuple[str, ...]):
+    """
+    returns a model listing the rate units given, shared by all the combo boxes showing the same units.
+    The model must not be modified, since other combo boxes may be using it
+    """
+    return QStringListModel(list(units))
+
+
+def set_units_model(combo_box: QComboBox, units: typing.Iterable[str]):
+    """
+    shows the rate units given in combo_box, only changing its model if needed
+    """
+    model = _units_model(tuple(units))
+    if combo_box.model() is not model:
+        combo_box.setModel(model)
+
+
+# the .ui files and the media are looked up next to the code, whatever the current working directory
+GUI_FOLDER = os.path.dirname(os.path.abspath(__file__))
+MEDIA_FOLDER = os.path.join(os.path.dirname(GUI_FOLDER), "media")
+ALARM_SOUND_FILE = os.path.join(MEDIA_FOLDER, "beep3x6.wav")
+ALARM_ICON_OFF_FILE = os.path.join(MEDIA_FOLDER, "alarm-clock-OFF.png")
+ALARM_ICON_ON_FILE = os.path.join(MEDIA_FOLDER, "alarm-clock-ON.png")
+
+# one stylesheet for all the drug panels, set once on their container rather than in every panel's .ui,
+# so that Qt parses it a single time instead of once per panel
+DRUG_PANELS_STYLESHEET = """
+DrugPumpPanel, DrugPumpPanel * { background-color: #C1C9E2; }
+QLabel#_drugNameLabel { font-size: 12pt; font-family: "Monospace"; font-weight: bold; }
+QLabel#_pumpLabel { font-size: 8pt; color: #999; }
+"""
+
+QWIDGETSIZE_MAX = 16777215  # maximum size of a QWidget, as defined by Qt
 # noinspection SpellCheckingInspection
 MIN_VAL_QDOUBLESPINBOX = 0.1
 # noinspection SpellCheckingInspection
@@ -102,10 +219,15 @@ class ClockWidget(QWidget):
         self.TIME_FORMAT = "%H:%M"
         self.DATE_FORMAT = "%x"
 
+        # the labels are only updated when the text they show changes
+        self._lastTime = None
+        self._lastDate = None
+
+        # the timer is re-armed at every event to fire right after the next minute rollover
         self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
         # noinspection PyUnresolvedReferences
         self._timer.timeout.connect(self.on_time_event)
-        self._timer.start(250)
         self._vbox = QVBoxLayout(self)
         self._vbox.setAlignment(Qt.AlignCenter)
 
@@ -114,13 +236,12 @@ class ClockWidget(QWidget):
         f.setBold(True)
         f.setPointSize(time_size)
         self._timeLabel.setFont(f)
-        self._timeLabel.setText(datetime.datetime.now().strftime(self.TIME_FORMAT))
 
         self._dateLabel = QLabel(self)
         f.setBold(False)
         f.setPointSize(date_size)
         self._dateLabel.setFont(f)
-        self._dateLabel.setText(datetime.datetime.now().strftime(self.DATE_FORMAT))
+        self.on_time_event()
 
         self._vbox.addStretch(1)
         self._vbox.addWidget(self._timeLabel, 0, Qt.AlignCenter)
@@ -130,20 +251,29 @@ class ClockWidget(QWidget):
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
 
     def on_time_event(self):
-        self._timeLabel.setText(datetime.datetime.now().strftime(self.TIME_FORMAT))
-        self._dateLabel.setText(datetime.datetime.now().strftime(self.DATE_FORMAT))
+        now = datetime.datetime.now()
+        time_text = now.strftime(self.TIME_FORMAT)
+        if time_text != self._lastTime:
+            self._timeLabel.setText(time_text)
+            self._lastTime = time_text
+        date_text = now.strftime(self.DATE_FORMAT)
+        if date_text != self._lastDate:
+            self._dateLabel.setText(date_text)
+            self._lastDate = date_text
+        ms_to_next_minute = (60 - now.second) * 1000 - now.microsecond // 1000
+        self._timer.start(ms_to_next_minute + 50)  # small margin, to be sure to land in the new minute
 
 
 class CustomDialog(QDialog):
+    # the dialogs used by get_double() and get_time() are built once, then reconfigured on each call
+    _doubleDialog = None
+    _timeDialog = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.buttonBox = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        self.buttonBox.button(QDialogButtonBox.Ok).setIcon(
-            QApplication.style().standardIcon(QStyle.SP_DialogOkButton)
-        )
-        self.buttonBox.button(QDialogButtonBox.Cancel).setIcon(
-            QApplication.style().standardIcon(QStyle.SP_DialogCancelButton)
-        )
+        self.buttonBox.button(QDialogButtonBox.Ok).setIcon(_standard_icon(QStyle.SP_DialogOkButton))
+        self.buttonBox.button(QDialogButtonBox.Cancel).setIcon(_standard_icon(QStyle.SP_DialogCancelButton))
         self.buttonBox.accepted.connect(self.accept)
         self.buttonBox.rejected.connect(self.reject)
 
@@ -168,6 +298,16 @@ class CustomDialog(QDialog):
 
         self.setGeometry(new_rect)
 
+    @staticmethod
+    def _exec_over(dlg, parent):
+        # the dialog is shared by all the callers, it only belongs to the parent while it is shown, so that it is
+        # modal to the right window and is not deleted along with that parent
+        dlg.setParent(parent, dlg.windowFlags())
+        try:
+            return dlg.exec()
+        finally:
+            dlg.setParent(None, dlg.windowFlags())
+
     @staticmethod
     def get_double(
             parent,
@@ -178,30 +318,38 @@ class CustomDialog(QDialog):
             text=None,
             title="Enter a value",
     ):
-        dlg = CustomDialog()
-
-        spin_box = QDoubleSpinBox(parent)
-        spin_box.setDecimals(4)
+        if CustomDialog._doubleDialog is None:
+            dlg = CustomDialog()
+            dlg.spinBox = QDoubleSpinBox(dlg)
+            dlg.spinBox.setDecimals(4)
+            dlg.spinBox.setMinimumWidth(50)
+            dlg.spinBox.setAlignment(Qt.AlignRight)
+            dlg.textLabel = QLabel(dlg)
+            dlg.layout.insertWidget(0, dlg.spinBox)
+            dlg.layout.insertWidget(0, dlg.textLabel)
+            CustomDialog._doubleDialog = dlg
+        dlg = CustomDialog._doubleDialog
+
+        spin_box = dlg.spinBox
         spin_box.setMinimum(min_val)
         spin_box.setMaximum(max_val)
         spin_box.setValue(value)
-        spin_box.setMinimumWidth(50)
-        spin_box.setAlignment(Qt.AlignRight)
-        if units is not None:
-            spin_box.setSuffix(" " + units)
-
-        dlg.layout.insertWidget(0, spin_box)
-        if text is not None:
-            txt = QLabel(text)
-            dlg.layout.insertWidget(0, txt)
+        spin_box.setSuffix("" if units is None else " " + units)
+
+        dlg.textLabel.setText("" if text is None else text)
+        dlg.textLabel.setVisible(text is not None)
         dlg.setWindowTitle(title)
+        # showEvent() fixes the size of the dialog, let it adapt to its new content first
+        dlg.setMinimumSize(0, 0)
+        dlg.setMaximumSize(QWIDGETSIZE_MAX, QWIDGETSIZE_MAX)
+        dlg.adjustSize()
 
         # noinspection SpellCheckingInspection
         line_edit = spin_box.findChild(QLineEdit, "qt_spinbox_lineedit")
         line_edit.selectAll()
         spin_box.setFocus()
 
-        result = dlg.exec()
+        result = CustomDialog._exec_over(dlg, parent)
         val = spin_box.value()
         return val, result == QDialog.Accepted
 
@@ -209,50 +357,61 @@ class CustomDialog(QDialog):
     def get_time(
             parent, value=0, text="Time before alarm", title="Enter the amount of time"
     ):
-        # noinspection PyUnusedLocal
-        def on_radio_click(event):
-            if m30_button.isChecked() or m10_button.isChecked():
-                time_box.setEnabled(False)
-            else:
-                time_box.setEnabled(True)
-                # noinspection SpellCheckingInspection
-                line_edit = time_box.findChild(QLineEdit, "qt_spinbox_lineedit")
-                line_edit.selectAll()
-                time_box.setFocus()
+        if CustomDialog._timeDialog is None:
+            dlg = CustomDialog()
+            dlg.textLabel = QLabel()
+            dlg.m30Button = QRadioButton("30 min")
+            dlg.m10Button = QRadioButton("10 min")
+            dlg.customButton = QRadioButton("Custom:")
+            dlg.timeBox = QSpinBox()
+            dlg.timeBox.setMinimum(1)
+            dlg.timeBox.setMaximum(2147483647)
+            dlg.timeBox.setSuffix(" min")
+
+            # noinspection PyUnusedLocal
+            def on_radio_click(event):
+                if dlg.m30Button.isChecked() or dlg.m10Button.isChecked():
+                    dlg.timeBox.setEnabled(False)
+                else:
+                    dlg.timeBox.setEnabled(True)
+                    # noinspection SpellCheckingInspection
+                    line_edit = dlg.timeBox.findChild(QLineEdit, "qt_spinbox_lineedit")
+                    line_edit.selectAll()
+                    dlg.timeBox.setFocus()
+
+            dlg.on_radio_click = on_radio_click
+            dlg.m30Button.toggled.connect(on_radio_click)
+            dlg.m10Button.toggled.connect(on_radio_click)
+            dlg.customButton.toggled.connect(on_radio_click)
+
+            layout = QGridLayout()
+            layout.addWidget(dlg.textLabel, 0, 0, 1, 2)
+            layout.addWidget(dlg.m30Button, 1, 0, 1, 2)
+            layout.addWidget(dlg.m10Button, 2, 0, 1, 2)
+            layout.addWidget(dlg.customButton, 3, 0)
+            layout.addWidget(dlg.timeBox, 3, 1)
+            dlg.layout.insertLayout(0, layout)
+            CustomDialog._timeDialog = dlg
+        dlg = CustomDialog._timeDialog
+        m30_button, m10_button, time_box = dlg.m30Button, dlg.m10Button, dlg.timeBox
 
-        dlg = CustomDialog(parent)
         dlg.setWindowTitle(title)
-
-        label = QLabel(text)
-        m30_button = QRadioButton("30 min")
-        m10_button = QRadioButton("10 min")
-        custom_button = QRadioButton("Custom:")
-        time_box = QSpinBox()
-        time_box.setMinimum(1)
-        time_box.setMaximum(2147483647)
-        time_box.setSuffix(" min")
-        if value == 30:
-            m30_button.setChecked(True)
-        elif value == 10:
-            m10_button.setChecked(True)
-        else:
-            custom_button.setChecked(True)
+        dlg.textLabel.setText(text)
+        with QSignalBlocker(m30_button), QSignalBlocker(m10_button), QSignalBlocker(dlg.customButton):
+            if value == 30:
+                m30_button.setChecked(True)
+            elif value == 10:
+                m10_button.setChecked(True)
+            else:
+                dlg.customButton.setChecked(True)
         time_box.setValue(1 if value is None else value)
-        on_radio_click(None)
-
-        m30_button.toggled.connect(on_radio_click)
-        m10_button.toggled.connect(on_radio_click)
-        custom_button.toggled.connect(on_radio_click)
-
-        layout = QGridLayout()
-        layout.addWidget(label, 0, 0, 1, 2)
-        layout.addWidget(m30_button, 1, 0, 1, 2)
-        layout.addWidget(m10_button, 2, 0, 1, 2)
-        layout.addWidget(custom_button, 3, 0)
-        layout.addWidget(time_box, 3, 1)
+        dlg.on_radio_click(None)
+        # showEvent() fixes the size of the dialog, let it adapt to its new content first
+        dlg.setMinimumSize(0, 0)
+        dlg.setMaximumSize(QWIDGETSIZE_MAX, QWIDGETSIZE_MAX)
+        dlg.adjustSize()
 
-        dlg.layout.insertLayout(0, layout)
-        result = dlg.exec()
+        result = CustomDialog._exec_over(dlg, parent)
         if m30_button.isChecked():
             val = 30
         elif m10_button.isChecked():
@@ -287,9 +446,7 @@ class CustomDialog(QDialog):
         layout.addWidget(drug_volume_input, 1, 1)
         if add_inject:
             add_inject_button = QPushButton("Add and inject")
-            add_inject_button.setIcon(
-                QApplication.style().standardIcon(QStyle.SP_DialogOkButton)
-            )
+            add_inject_button.setIcon(_standard_icon(QStyle.SP_DialogOkButton))
             add_inject_button.setDefault(True)
             add_inject_button.clicked.connect(
                 lambda: dlg.done(QDialogButtonBox.YesToAll)
@@ -344,7 +501,7 @@ class DrugEditDialog(QDialog):
     ):
         super().__init__()
         pumps = [] if pumps is None else pumps
-        uic.loadUi("./GUI/DrugEditDialog.ui", self)
+        load_ui(os.path.join(GUI_FOLDER, "DrugEditDialog.ui"), self)
         self.drugNameLineEdit.setText(name)
         self.drugDoseSpinBox.setValue(float(dose))
         self.drugConcentrationSpinBox.setValue(float(concentration))
@@ -381,22 +538,46 @@ class DrugEditDialog(QDialog):
 
 
 class DrugTimer(QLabel):
+    # a single timer, shared by all the instances, drives every running DrugTimer.
+    # It fires just after the next running timer reaches a whole second, which is when its display changes
+    _tickTimer: QTimer = None
+    _TICK_MARGIN = 5  # ms
+    _tickSubscribers: List["DrugTimer"] = []
+    # pre-rendered text of the seconds label, indexed by the number of seconds
+    _SECONDS_TEXT = tuple(f":{secs:02d}" for secs in range(60))
+    __FORMAT_COLOR_NORMAL = "black"
+    __FORMAT_COLOR_ALARM = "red"
+
     def __init__(self, parent, alarm_threshold=None, alarm_sound_file=None):
         super().__init__(parent)
-        self._duration = datetime.timedelta()
+        self._elapsed = 0  # in seconds
+        self._displayedMinutes = None
         self._startTime = None
-        self.__FORMAT = """<p>
-        <span style="font-family: monospace; font-size:24pt; font-weight:bold">{:02.0f}:{:02.0f}</span>
-        <span style="font-family: monospace; font-size:10pt; font-weight:normal;">:{:02.0f}</span>
-        </p>"""
-        self.__FORMAT_COLOR_NORMAL = "black"
-        self.__FORMAT_COLOR_ALARM = "red"
-        self.__FORMAT_STYLESHEET = "color: {:s}"
-        self.setStyleSheet(self.__FORMAT_STYLESHEET.format(self.__FORMAT_COLOR_NORMAL))
+        # hours and minutes are shown in a large font, seconds in a smaller one next to them.
+        # Both labels use plain text, so that Qt does not have to parse rich text on every update
+        self._hoursMinutesLabel = QLabel(self)
+        self._hoursMinutesLabel.setTextFormat(Qt.PlainText)
+        self._hoursMinutesLabel.setFont(QFont("monospace", 24, QFont.Bold))
+        self._secondsLabel = QLabel(self)
+        self._secondsLabel.setTextFormat(Qt.PlainText)
+        self._secondsLabel.setFont(QFont("monospace", 10))
+        layout = QHBoxLayout(self)
+        layout.setSizeConstraint(QLayout.SetMinimumSize)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addStretch(1)
+        layout.addWidget(self._hoursMinutesLabel, 0, Qt.AlignBottom)
+        layout.addWidget(self._secondsLabel, 0, Qt.AlignBottom)
+        layout.addStretch(1)
+        # the alarm blinks by swapping between two palettes, which does not involve Qt's stylesheet parser
+        self._paletteNormal = QPalette(self.palette())
+        self._paletteNormal.setColor(QPalette.WindowText, QColor(self.__FORMAT_COLOR_NORMAL))
+        self._paletteAlarm = QPalette(self.palette())
+        self._paletteAlarm.setColor(QPalette.WindowText, QColor(self.__FORMAT_COLOR_ALARM))
+        self._showsAlarmColor = True
+        self.show_alarm_color(False)
         self.update_text()
         self.setAlignment(Qt.AlignHCenter | Qt.AlignVCenter)
-        self._clockTimer = QTimer(self)
-        self._clockTimer_PERIOD = 100  # ms
         self._alarmThresh = alarm_threshold
         self._alarmTimer = QTimer(self)
         self._alarmTimer_PERIOD = 500  # ms
@@ -404,44 +585,81 @@ class DrugTimer(QLabel):
         self._alarmTimerMaxCount = 10
         self._isAlarmTimerPastMaxDuration = False
         self._alarmTimer.timerEvent = self.on_alarm_timer
-        self._clockTimer.timerEvent = self.on_clock_timer
         self.mouseDoubleClickEvent = self.reset
         self._alarmSound = None
+        self._alarmChannel = None
         self.set_alarm_sound_file(alarm_sound_file)
 
+    @classmethod
+    def _on_tick(cls):
+        now = time.monotonic()
+        # iterate over a copy: an alarm can reset (and so unsubscribe) a timer
+        for timer in list(cls._tickSubscribers):
+            timer._tick_elapsed(now)
+        cls._schedule_tick()
+
+    @classmethod
+    def _schedule_tick(cls):
+        if len(cls._tickSubscribers) == 0:
+            cls._tickTimer.stop()
+            return
+        now = time.monotonic()
+        delay = min(1.0 - (now - timer._startTime) % 1.0 for timer in cls._tickSubscribers)
+        cls._tickTimer.start(int(delay * 1000) + cls._TICK_MARGIN)
+
+    @property
+    def is_running(self):
+        return self in DrugTimer._tickSubscribers
+
     def start(self):
-        self._startTime = datetime.datetime.today()
-        self._clockTimer.start(self._clockTimer_PERIOD)
+        self._startTime = time.monotonic()
+        if not self.is_running:
+            DrugTimer._tickSubscribers.append(self)
+        if DrugTimer._tickTimer is None:
+            DrugTimer._tickTimer = QTimer()
+            DrugTimer._tickTimer.setSingleShot(True)
+            # a coarse timer may fire a little early, and the seconds would then be shown late
+            DrugTimer._tickTimer.setTimerType(Qt.PreciseTimer)
+            DrugTimer._tickTimer.timeout.connect(DrugTimer._on_tick)
+        DrugTimer._schedule_tick()
+
+    def stop(self):
+        if self.is_running:
+            DrugTimer._tickSubscribers.remove(self)
+        if len(DrugTimer._tickSubscribers) == 0 and DrugTimer._tickTimer is not None:
+            DrugTimer._tickTimer.stop()
 
     def update_text(self):
-        hrs = self._duration.seconds // (60 * 60)
-        r = self._duration.seconds - hrs * 60 * 60
-        minutes = r // 60
-        secs = r - minutes * 60
-        self.setText(self.__FORMAT.format(hrs, minutes, secs))
+        total_minutes, secs = divmod(self._elapsed, 60)
+        if total_minutes != self._displayedMinutes:
+            # the hours:minutes part only needs to be formatted once a minute
+            hrs, minutes = divmod(total_minutes, 60)
+            self._hoursMinutesLabel.setText(f"{hrs:02d}:{minutes:02d}")
+            self._displayedMinutes = total_minutes
+        self._secondsLabel.setText(self._SECONDS_TEXT[secs])
 
     # noinspection PyUnusedLocal
     def reset(self, event):
-        if self._clockTimer.isActive():  # timer is going
-            self._clockTimer.stop()
-            self._duration = datetime.timedelta()  # reset duration to 0
+        if self.is_running:  # timer is going
+            self.stop()
+            self._elapsed = 0  # reset duration to 0
             self.update_text()
             if self._alarmTimer.isActive():
                 self._alarmTimer.stop()
-            self.setStyleSheet(
-                self.__FORMAT_STYLESHEET.format(self.__FORMAT_COLOR_NORMAL)
-            )
+            self.show_alarm_color(False)
             self._isAlarmTimerPastMaxDuration = False
-            if self._alarmSound is not None:
-                self._alarmSound.stop()
-
-    # noinspection PyUnusedLocal
-    def on_clock_timer(self, event):
-        self._duration = datetime.datetime.today() - self._startTime
-        self.update_text()
+            if self._alarmChannel is not None:
+                self._alarmChannel.stop()
+
+    def _tick_elapsed(self, now):
+        elapsed = int(now - self._startTime)
+        if elapsed != self._elapsed:
+            # the display only changes once per second
+            self._elapsed = elapsed
+            self.update_text()
         if (
                 self._alarmThresh is not None
-                and self._duration.seconds > self._alarmThresh
+                and self._elapsed > self._alarmThresh
                 and not self._isAlarmTimerPastMaxDuration
                 and not self._alarmTimer.isActive()
         ):
@@ -451,7 +669,7 @@ class DrugTimer(QLabel):
         self.on_alarm_timer(None)
         self._alarmTimer.start(self._alarmTimer_PERIOD)
         if self._alarmSound is not None:
-            self._alarmSound.play(-1)
+            self._alarmChannel.play(self._alarmSound, loops=-1)
 
     def set_alarm_threshold_in_minutes(self, duration_in_minutes):
         if duration_in_minutes is not None:
@@ -461,13 +679,7 @@ class DrugTimer(QLabel):
 
     # noinspection PyUnusedLocal
     def on_alarm_timer(self, event):
-        self.setStyleSheet(
-            self.__FORMAT_STYLESHEET.format(
-                self.__FORMAT_COLOR_ALARM
-                if self._alarmTimerCount % 2 == 0
-                else self.__FORMAT_COLOR_NORMAL
-            )
-        )
+        self.show_alarm_color(self._alarmTimerCount % 2 == 0)
         self._alarmTimerCount += 1
         if (
                 self._alarmTimer.isActive()
@@ -475,13 +687,22 @@ class DrugTimer(QLabel):
         ):
             self.on_alarm_past_max_duration()
 
+    def show_alarm_color(self, alarm: bool):
+        # setPalette() repaints the labels, only call it when the color actually changes
+        if alarm != self._showsAlarmColor:
+            palette = self._paletteAlarm if alarm else self._paletteNormal
+            # set on the labels themselves: a style sheet on a parent widget stops the palette from propagating
+            self._hoursMinutesLabel.setPalette(palette)
+            self._secondsLabel.setPalette(palette)
+            self._showsAlarmColor = alarm
+
     def on_alarm_past_max_duration(self):
         self._isAlarmTimerPastMaxDuration = True
         self._alarmTimer.stop()
         self._alarmTimerCount = 0
-        self.setStyleSheet(self.__FORMAT_STYLESHEET.format(self.__FORMAT_COLOR_ALARM))
-        if self._alarmSound is not None:
-            self._alarmSound.stop()
+        self.show_alarm_color(True)
+        if self._alarmChannel is not None:
+            self._alarmChannel.stop()
 
     @property
     def alarm_threshold(self):
@@ -493,7 +714,9 @@ class DrugTimer(QLabel):
 
     def set_alarm_sound_file(self, path):
         if path is not None and os.path.isfile(path):
-            self._alarmSound = pygame.mixer.Sound(path)
+            self._alarmSound = load_sound(path)
+            if self._alarmChannel is None:
+                self._alarmChannel = reserve_channel()
 
 
 class PumpTimer(DrugTimer):
@@ -526,6 +749,90 @@ class PumpTimer(DrugTimer):
             self.pumpPanel.on_full_dose_button_click(None)
 
 
+class PumpPoller(QThread):
+    """
+    Single background thread that polls the syringe pumps waiting for the end of an injection, instead of having
+    one thread per pump. When a watched pump stops, its callback is run from this thread.
+    """
+
+    POLL_PERIOD = 100  # ms
+
+    def __init__(self, pumps: List[SyringePump], parent=None):
+        super().__init__(parent)
+        self._pumps = pumps
+        self._watched = {}  # pump index -> list of callbacks to run once the pump has stopped
+        self._lock = threading.Lock()
+
+    def watch(self, pump_index, on_stopped=None):
+        """
+        starts polling the pump at index pump_index, until it stops. on_stopped is then called (from the polling thread)
+        """
+        with self._lock:
+            callbacks = self._watched.setdefault(pump_index, [])
+            if on_stopped is not None:
+                callbacks.append(on_stopped)
+
+    def stop(self):
+        self.requestInterruption()
+        self.wait()
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            with self._lock:
+                watched = list(self._watched)
+            for pump_index in watched:
+                try:
+                    is_running = self._pumps[pump_index].is_running()
+                except (SyringePumpException, serial.SerialException, OSError):
+                    # a pump that cannot be polled is handled as stopped, so that its panel recovers, and the
+                    # other pumps keep being polled
+                    logger.exception("error while polling pump #%d, it is no longer watched", pump_index)
+                    is_running = False
+                if not is_running:
+                    with self._lock:
+                        callbacks = self._watched.pop(pump_index)
+                    for callback in callbacks:
+                        try:
+                            callback()
+                        except (SyringePumpException, serial.SerialException, OSError):
+                            logger.exception("error while handling the end of an injection")
+            self.msleep(self.POLL_PERIOD)
+
+
+class LogParser(QThread):
+    """
+    Parses a log file in the background, so that the GUI does not freeze on large log files.
+    The result is (subject, drugs), as returned by LogBox.parse(), or (None, []) if the file could not be read
+    """
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self._path = path
+        self.result = None, []
+
+    def run(self):
+        try:
+            self.result = LogBox.parse(self._path)
+        except (OSError, ValueError):
+            logger.exception("error while parsing the log file %s", self._path)
+
+    def parse(self):
+        """
+        parses the log file and returns the result, while keeping the GUI responsive and showing a busy dialog
+        if it takes a while
+        """
+        progress = QProgressDialog("Reading the previous log file...", "", 0, 0)
+        progress.setWindowTitle("Previous session detected")
+        progress.setCancelButton(None)
+        progress.setMinimumDuration(500)
+        loop = QEventLoop()
+        self.finished.connect(loop.quit)
+        self.start()
+        loop.exec()
+        progress.close()
+        return self.result
+
+
 class PhysioMonitorMainScreen(QMainWindow):
     logTextEdit: QPlainTextEdit
     clock: ClockWidget
@@ -537,13 +844,15 @@ class PhysioMonitorMainScreen(QMainWindow):
     def __init__(self, config: dict, pump_serial_ports=None, pumps=None):
         super().__init__()
         # Load the UI Page
-        uic.loadUi("./GUI/MainScreen.ui", self)
+        load_ui(os.path.join(GUI_FOLDER, "MainScreen.ui"), self)
         self.config = config
-        self.setWindowIcon(QIcon("../media/icon.png"))
+        self.setWindowIcon(_icon(os.path.join(MEDIA_FOLDER, "icon.png")))
 
         ##
         # Plots
         ###
+        self._plots: List[ScrollingScope] = []
+        plots_by_stream = {}
         for i, channel in enumerate(config["channels"]):
             plot = PagedScope(
                 acquisition_module_index=channel["acquisition-module-index"],
@@ -579,6 +888,19 @@ class PhysioMonitorMainScreen(QMainWindow):
                 alarm_sound_file=channel["alarm-sound-file"],
             )
             self._graphLayout.addItem(plot, i, 1)
+            self._plots.append(plot)
+            plots_by_stream.setdefault(plot.acquisition_module_index, []).append(plot)
+        # for each stream, the plots that display its data and the matching channel indices,
+        # so that all the channels of a stream can be extracted at once in update()
+        self._plotsByStream = {
+            stream_index: (plots, np.array([plot.channel_index for plot in plots]))
+            for stream_index, plots in plots_by_stream.items()
+        }
+        # the trend units do not change, so the format of each measurement can be built once
+        # (units such as "%" need to be escaped for %-formatting)
+        self._trendFormats = [
+            "%.1f " + str(plot.getTrendUnits()).replace("%", "%%") for plot in self._plots
+        ]
 
         self.logBox = LogBox(
             path=config["log-path"],
@@ -620,21 +942,22 @@ class PhysioMonitorMainScreen(QMainWindow):
         # Syringe pump(s)
         ##
         self.pumps = [] if pumps is None else pumps
+        self.pumpPoller = PumpPoller(self.pumps)
 
+        self.scrollAreaWidgetContents.setStyleSheet(DRUG_PANELS_STYLESHEET)
         for i, drug in enumerate(config["drug-list"]):
             if drug.pump is not None and self.pumps[drug.pump] is not None:
                 panel = DrugPumpPanel(None, drug.name, drug.volume, pump=self.pumps[drug.pump],
-                                      alarm_sound_file="./media/beep3x6.wav", main_window=self)
+                                      alarm_sound_file=ALARM_SOUND_FILE, main_window=self)
             else:
                 panel = DrugPanel(
                     None,
                     drug.name,
                     drug.volume,
-                    alarm_sound_filename="./media/beep3x6.wav",
+                    alarm_sound_filename=ALARM_SOUND_FILE,
                     main_window=self
                 )
             self.drugPanelsLayout.addWidget(panel)
-
         # Timer with callback to update plots
         self.__refreshScopeTimer = QTimer()
         self.__refreshScopeTimer.timeout.connect(self.update)
@@ -656,26 +979,25 @@ class PhysioMonitorMainScreen(QMainWindow):
         self.__physioToLogTimer.start(
             self.config["measurements-output-period-min"] * 60 * 1000
         )
-        for i in range(len(self._graphLayout.centralWidget.items)):
-            plot = self._graphLayout.getItem(i, 1)
+        self.pumpPoller.start()
+        for plot in self._plots:
             plot.start()
 
     def update(self):
-        data = [stream.read() for stream in self.__streams]
-        for i in range(len(self._graphLayout.centralWidget.items)):
-            plot: ScrollingScope = self._graphLayout.getItem(i, 1)
-            d = data[plot.acquisition_module_index]
-            if d is not None and np.asarray(d).size > 0:  # some data was returned
-                d = d[plot.channel_index, :]
-                plot.append(d)
+        for stream_index, stream in enumerate(self.__streams):
+            d = stream.read()
+            if stream_index not in self._plotsByStream:
+                continue
+            if d is not None and d.shape[-1] > 0:  # some data was returned
+                plots, channels = self._plotsByStream[stream_index]
+                for plot, row in zip(plots, d[channels, :]):
+                    plot.append(row)
 
     def get_physio_measurements(self) -> List:
         measurements = []
-        for i in range(len(self._graphLayout.centralWidget.items)):
-            plot: ScrollingScope = self._graphLayout.getItem(i, 1)
+        for plot, trend_format in zip(self._plots, self._trendFormats):
             if plot.trendEnabled:
-                value = plot.getLastTrendData()
-                measurements.append("{:.1f} {:s}".format(value, plot.getTrendUnits()))
+                measurements.append(trend_format % plot.getLastTrendData())
             else:
                 measurements.append("")
         return measurements
@@ -701,7 +1023,7 @@ class PhysioMonitorMainScreen(QMainWindow):
                 drug_name=name,
                 drug_volume=volume,
                 main_window=self,
-                alarm_sound_filename="media/beep3x6.wav",
+                alarm_sound_filename=ALARM_SOUND_FILE,
             )
             self.drugPanelsLayout.addWidget(new_panel)
             if ok == QDialogButtonBox.YesToAll:
@@ -709,8 +1031,7 @@ class PhysioMonitorMainScreen(QMainWindow):
 
     def add_vline(self, legend):
         line_color = next(vline_color_iterator)
-        for i in range(len(self._graphLayout.centralWidget.items)):
-            plot: ScrollingScope = self._graphLayout.getItem(i, 1)
+        for i, plot in enumerate(self._plots):
             if i == 0:  # only show the legend on the top plot
                 plot.add_trend_vline(legend, color=line_color)
             else:
@@ -719,6 +1040,10 @@ class PhysioMonitorMainScreen(QMainWindow):
     def closeEvent(self, event: QCloseEvent) -> None:
         self.__refreshScopeTimer.stop()
         self.__physioToLogTimer.stop()
+        for plot in self._plots:
+            plot.stop()
+        self.pumpPoller.stop()
+        self.logBox.close()
         for stream in self.__streams:
             stream.close()
         event.accept()
@@ -743,6 +1068,10 @@ class DrugPanel(QWidget):
     _drugVolume: float
     _main_window: PhysioMonitorMainScreen
 
+    _LABEL_FORMAT = "{drugName} ({drugVolume:.0f} μL)"
+    _ALARM_LABEL_ON = "Alarm\n({:.0f} min)"
+    _ALARM_LABEL_OFF = "Set\nalarm"
+
     def __init__(
             self,
             parent,
@@ -752,11 +1081,8 @@ class DrugPanel(QWidget):
             main_window: PhysioMonitorMainScreen = None,
     ):
         super().__init__(parent)
-        uic.loadUi("./GUI/DrugPanel.ui", self)
+        load_ui(os.path.join(GUI_FOLDER, "DrugPanel.ui"), self)
 
-        self._LABEL_FORMAT = "{drugName} ({drugVolume:.0f} μL)"
-        self._ALARM_LABEL_ON = "Alarm\n({:.0f} min)"
-        self._ALARM_LABEL_OFF = "Set\nalarm"
         self._drugName = drug_name
         self._drugVolume = drug_volume
         self._injTime = None
@@ -770,10 +1096,7 @@ class DrugPanel(QWidget):
         self._drugNameLabel.mouseDoubleClickEvent = self.on_drug_label_click
         self._timer.set_alarm_sound_file(alarm_sound_filename)
 
-        ico = QIcon()
-        ico.addFile("./media/alarm-clock-OFF.png", state=QIcon.Off)
-        ico.addFile("./media/alarm-clock-ON.png", state=QIcon.On)
-        self._alarmButton.setIcon(ico)
+        self._alarmButton.setIcon(_icon(ALARM_ICON_OFF_FILE, ALARM_ICON_ON_FILE))
         self._alarmButton.setIconSize(QSize(20, 20))
 
         self._fullDoseButton.clicked.connect(self.on_full_dose_button_click)
@@ -849,17 +1172,23 @@ class DrugPumpPanel(QWidget):
     _perfUnitComboBox: QComboBox
     _startPerfButton: QPushButton
     _pumpLabel: QLabel
-    _waitThread: threading.Thread
+
+    _LABEL_FORMAT = "{drugName} ({drugVolume:.1f} μL)"
+    _ALARM_LABEL_ON = "Alarm\n({:.0f} min)"
+    _ALARM_LABEL_OFF = "Set\nalarm"
+    _START_PERF_FORMAT = ">> Start perf {drugName} ({rate:.2f} {units})"
+    _STOP_PERF_FORMAT = "<< End perf\t{drugName}"
+
+    # emitted from the pump poller thread, so that the widgets are updated from the GUI thread
+    injectionFinished = pyqtSignal()
 
     def __init__(self, parent, drug_name, drug_volume, pump: SyringePumps.SyringePump, alarm_sound_file=None,
                  main_window: PhysioMonitorMainScreen = None):
         super().__init__(parent)
-        uic.loadUi("./GUI/DrugPumpPanel.ui", self)
+        load_ui(os.path.join(GUI_FOLDER, "DrugPumpPanel.ui"), self)
 
         drug_volume = float(drug_volume)
-        self._LABEL_FORMAT = "{drugName} ({drugVolume:.1f} μL)"
-        self._ALARM_LABEL_ON = "Alarm\n({:.0f} min)"
-        self._ALARM_LABEL_OFF = "Set\nalarm"
+        self._pump = pump
         self._drugName = drug_name
         self._drugVolume = drug_volume
         self._injTime = None
@@ -875,10 +1204,7 @@ class DrugPumpPanel(QWidget):
             pump_panel=self, alarm_threshold=None, alarm_sound_file=alarm_sound_file
         )
 
-        ico = QIcon()
-        ico.addFile("./media/alarm-clock-OFF.png", state=QIcon.Off)
-        ico.addFile("./media/alarm-clock-ON.png", state=QIcon.On)
-        self._alarmButton.setIcon(ico)
+        self._alarmButton.setIcon(_icon(ALARM_ICON_OFF_FILE, ALARM_ICON_ON_FILE))
         self._alarmButton.setIconSize(QSize(20, 20))
 
         self._fullDoseButton.clicked.connect(self.on_full_dose_button_click)
@@ -886,13 +1212,6 @@ class DrugPumpPanel(QWidget):
         self._customDoseButton.clicked.connect(self.on_custom_dose_button_click)
         self._alarmButton.toggled.connect(self.on_choice_alarm)
 
-        self._START_PERF_FORMAT = ">> Start perf {drugName} ({rate:.2f} {units})"
-        self._STOP_PERF_FORMAT = "<< End perf\t{drugName}"
-        self._pump = pump
-        self._drugName = drug_name
-        self._drugVolume = drug_volume
-        self._injTime = None
-        self._timer.setup(pump_panel=self, alarm_sound_file=alarm_sound_file)
         self._pumpLabel.setText(self._pump.display_name)
 
         # FIXME: this does not work??
@@ -902,21 +1221,22 @@ class DrugPumpPanel(QWidget):
             self._halfDoseButton,
             self._startPerfButton,
         ]:
-            widget.setStyle(IconProxyStyle(widget.style()))
+            # no base style is passed: a QProxyStyle takes ownership of its base style, and widget.style() is the
+            # application style for a widget without a style sheet of its own, which would then be deleted twice at exit
+            widget.setStyle(IconProxyStyle())
         self._perfRateSpinBox.setMinimum(self._pump.min_val)
         self._perfRateSpinBox.setMaximum(self._pump.max_val)
 
         self._abortInjectButton = QPushButton("Abort", parent=self)
-        self._abortInjectButton.setIcon(
-            self.style().standardIcon(QStyle.SP_BrowserStop)
-        )
+        self._abortInjectButton.setIcon(_standard_icon(QStyle.SP_BrowserStop))
         self._abortInjectButton.setVisible(False)
         self._abortInjectButton.clicked.connect(self.abort_injection)
 
         self._startPerfButton.toggled.connect(self.on_toggle_perf)
         self._autoInjectCheckBox.toggled.connect(self.on_toggle_auto_inject)
+        self.injectionFinished.connect(self.on_injection_finished)
 
-        self._perfUnitComboBox.addItems(self._pump.get_possible_units())
+        set_units_model(self._perfUnitComboBox, self._pump.get_possible_units())
         self.update_from_pump()
 
     def on_toggle_perf(self):
@@ -957,16 +1277,18 @@ class DrugPumpPanel(QWidget):
     def update_from_pump(self):
         curr_rate = self._pump.get_rate()
         curr_units = self._pump.get_units()
-        self._perfRateSpinBox.setValue(curr_rate)
-        self._perfUnitComboBox.setCurrentIndex(curr_units)
-        if not self._pump.is_running():
-            self._startPerfButton.setChecked(False)
-            self.enable_perfusion_buttons(True)
-        else:
-            self._startPerfButton.blockSignals(True)
-            self._startPerfButton.setChecked(True)
-            self._startPerfButton.blockSignals(False)
-            self.enable_perfusion_buttons(False)
+        is_running = bool(self._pump.is_running())
+        # the widgets only reflect the state of the pump here, nothing must be sent back to it
+        with contextlib.ExitStack() as blockers:
+            for widget in (self._perfRateSpinBox, self._perfUnitComboBox, self._startPerfButton):
+                blockers.enter_context(QSignalBlocker(widget))
+            if self._perfRateSpinBox.value() != curr_rate:
+                self._perfRateSpinBox.setValue(curr_rate)
+            if self._perfUnitComboBox.currentIndex() != curr_units:
+                self._perfUnitComboBox.setCurrentIndex(curr_units)
+            if self._startPerfButton.isChecked() != is_running:
+                self._startPerfButton.setChecked(is_running)
+        self.enable_perfusion_buttons(not is_running)
 
     # noinspection DuplicatedCode
     def do_inject_drug(self, volume):
@@ -998,15 +1320,16 @@ class DrugPumpPanel(QWidget):
         self._main_window.write_to_log([], note=output)
         self._main_window.add_vline(legend=self._drugName)
         self._timer.start()
-        # disable buttons to avoid double injections, and start a thread to wait for the injection
+        # disable buttons to avoid double injections, and have the pump poller wait for the injection
         # to finish
         self.enable_inject_buttons(False)
-        time.sleep(0.2) # this is required for some pumps that take some time to get running, otherwise the GUI thinks the perfusion stops immediately
-        self._waitThread = threading.Thread(
-            target=self.wait_for_end_of_injection,
-            args=(curr_rate, curr_units, curr_dir),
+        on_stopped = functools.partial(self.restore_pump_state, curr_rate, curr_units, curr_dir)
+        pump_index = self._main_window.pumps.index(self._pump)
+        # the delay is required for some pumps that take some time to get running, otherwise the GUI thinks the
+        # perfusion stops immediately
+        QTimer.singleShot(
+            200, lambda: self._main_window.pumpPoller.watch(pump_index, on_stopped)
         )
-        self._waitThread.start()
 
     # noinspection PyUnusedLocal
     def on_full_dose_button_click(self, event):
@@ -1061,27 +1384,29 @@ class DrugPumpPanel(QWidget):
     # noinspection PyUnusedLocal
     def abort_injection(self, event):
         if self._pump.is_running():
+            # the pump poller sees that the pump stopped, restores its previous state and signals the end of the
+            # injection, which re-enables the buttons
             self._pump.stop()
-        while self._waitThread.is_alive():
-            # wait for thread to finish
-            time.sleep(0.01)
-        self.enable_inject_buttons(True)
 
-    def wait_for_end_of_injection(self, restore_rate, restore_units, restore_dir):
-        # logger.debug("in waitForEndOfInjection()")
-        while self._pump.is_running():
-            time.sleep(0.1)
-            pass
-            logger.debug("pump is still running")
+    def restore_pump_state(self, restore_rate, restore_units, restore_dir):
+        # called from the pump poller thread once the injection is over
         logger.debug("pump is finished pumping")
+        try:
+            logger.debug("restoring previous pump state")
+            self._pump.set_rate(restore_rate, restore_units)
+            if not restore_dir == self._pump.STATE.STOPPED:
+                self._pump.set_direction(restore_dir)
+                self._pump.clear_target_volume()
+                self._pump.start()
+        finally:
+            self.injectionFinished.emit()
+
+    def on_injection_finished(self):
         self.enable_inject_buttons(True)
-        logger.debug("restoring previous pump state")
-        self._pump.set_rate(restore_rate, restore_units)
-        if not restore_dir == self._pump.STATE.STOPPED:
-            self._pump.set_direction(restore_dir)
-            self._pump.clear_target_volume()
-            self._pump.start()
-        self.update_from_pump()
+        try:
+            self.update_from_pump()
+        except (SyringePumpException, serial.SerialException, OSError):
+            logger.exception("could not read the state of the pump after the injection")
 
     # noinspection PyUnusedLocal
     def on_drug_label_click(self, event):
@@ -1127,17 +1452,13 @@ class StartDialog(QDialog):
 
     def __init__(self, config, prev_values_file):
         super().__init__()
-        uic.loadUi("./GUI/StartScreen.ui", self)
-        self.setWindowIcon(QIcon("../media/icon.png"))
+        load_ui(os.path.join(GUI_FOLDER, "StartScreen.ui"), self)
+        self.setWindowIcon(_icon(os.path.join(MEDIA_FOLDER, "icon.png")))
         self.config = config
         self._prev_values_file = prev_values_file
 
-        self.buttonBox.button(QDialogButtonBox.Ok).setIcon(
-            QApplication.style().standardIcon(QStyle.SP_DialogOkButton)
-        )
-        self.buttonBox.button(QDialogButtonBox.Cancel).setIcon(
-            QApplication.style().standardIcon(QStyle.SP_DialogCancelButton)
-        )
+        self.buttonBox.button(QDialogButtonBox.Ok).setIcon(_standard_icon(QStyle.SP_DialogOkButton))
+        self.buttonBox.button(QDialogButtonBox.Cancel).setIcon(_standard_icon(QStyle.SP_DialogCancelButton))
 
         if "syringe-pump" in self.config:
             ##
@@ -1167,7 +1488,8 @@ class StartDialog(QDialog):
             ##
             self.pumps = []
             if "pumps" in self.config["syringe-pump"]:
-                for pump_conf in self.config["syringe-pump"]["pumps"]:
+                pump_confs = self.config["syringe-pump"]["pumps"]
+                for pump_conf in pump_confs:
                     if "module-args" not in pump_conf:
                         pump_conf["module-args"] = {}
                     model = pump_conf["module-name"]
@@ -1175,41 +1497,56 @@ class StartDialog(QDialog):
                         raise ValueError(
                             f'Invalid module "{model}". Must be one of {", ".join(AVAIL_PUMP_MODULES.keys())}'
                         )
-                    model = AVAIL_PUMP_MODULES[model]
-                    pump = None
-                    # sometimes, it takes a couple of tries for the pump to answer,
-                    # so we'll try in a loop and test if it was successful
-                    success = False
-                    while not success:
-                        for _ in range(3):
-                            try:
-                                pump = model(
-                                    display_name=pump_conf["display-name"],
-                                    serial_port=self.serialPorts[pump_conf["serial-port"]],
-                                    **pump_conf["module-args"],
-                                )
-                                pump.is_running()  # check that pump is working, should raise Exception if not
-                                success = True
-                                break
-                            except SyringePumpException:
-                                pump = None
-                        if not success:
-                            # noinspection PyTypeChecker
-                            ans = QMessageBox.question(
-                                None,
-                                "Pump not responding",
-                                f"Cannot communicate with the pump {model}, maybe it is off?\nRetry?",
-                            )
-                            if ans == QMessageBox.No:
-                                success = True
-                    self.pumps.append(pump)
+                pumps = [None] * len(pump_confs)
+                to_probe = list(range(len(pump_confs)))
+                while len(to_probe) > 0:
+                    # pumps on different serial ports are probed in parallel, but pumps sharing a serial port
+                    # (e.g. daisy-chained) have to be probed one after the other
+                    by_port = {}
+                    for i in to_probe:
+                        by_port.setdefault(pump_confs[i]["serial-port"], []).append(i)
+
+                    def probe_port(indices):
+                        for index in indices:
+                            pumps[index] = self._probe_pump(pump_confs[index])
+
+                    with ThreadPoolExecutor(max_workers=len(by_port)) as executor:
+                        list(executor.map(probe_port, by_port.values()))
+
+                    to_probe = [i for i in to_probe if pumps[i] is None]
+                    if len(to_probe) > 0:
+                        not_responding = ", ".join(
+                            f'{pump_confs[i]["display-name"]} ({pump_confs[i]["module-name"]})' for i in to_probe
+                        )
+                        # noinspection PyTypeChecker
+                        ans = QMessageBox.question(
+                            None,
+                            "Pump not responding",
+                            f"Cannot communicate with the pump(s) {not_responding}, maybe they are off?\nRetry?",
+                        )
+                        if ans == QMessageBox.No:
+                            to_probe = []
+                self.pumps = [None if pump is None else CachedPump(pump) for pump in pumps]
+            # the list of pumps does not change after this point, so filter it once.
+            # pumpNames follows self.pumps, since drugs refer to pumps by their index in it
+            self.activePumps = [p for p in self.pumps if p is not None]
+            self.activePumpNames = [p.display_name for p in self.activePumps]
+            self.pumpNames = [
+                "(not responding)" if p is None else p.display_name for p in self.pumps
+            ]
 
         # load previous values to pre-populate dialog
         try:
-            with open(self._prev_values_file, "r", encoding="utf-8") as f:
-                prev_values: dict = json.load(f)
+            with open(self._prev_values_file, "rb") as f:
+                raw_prev_values = f.read()
+            prev_values: dict = _json_loads(raw_prev_values)
         except (FileNotFoundError, json.JSONDecodeError):
+            raw_prev_values = b""
             prev_values = {}
+        # remember what is on disk, so we don't rewrite the file if nothing changed
+        self._prev_values_hash = hashlib.blake2b(
+            raw_prev_values, digest_size=16
+        ).digest()
         if "genotypes" not in prev_values.keys():
             prev_values["genotypes"] = []
         if "drugs" not in prev_values.keys():
@@ -1256,7 +1593,7 @@ class StartDialog(QDialog):
                 QMessageBox.Yes | QMessageBox.No,
             )
             if dlg == QMessageBox.Yes:
-                subject, drugs = LogBox.parse(self.log_path)
+                subject, drugs = LogParser(self.log_path).parse()
                 if subject is None:
                     # noinspection PyTypeChecker
                     QMessageBox.information(
@@ -1276,67 +1613,84 @@ class StartDialog(QDialog):
         )
         self.subjectSexButtonGroup.button(self.subject.sex).setChecked(True)
         self.subjectWeightSpinBox.setValue(self.subject.weight)
+        # the current genotype goes first, followed by the other known genotypes without duplicates
+        genotypes = [self.subject.genotype] + [
+            genotype
+            for genotype in dict.fromkeys(prev_values["genotypes"])
+            if genotype != self.subject.genotype
+        ]
         self.subjectGenotypeComboBox.setModel(
-            QStringListModel()
+            QStringListModel(genotypes, self)
         )  # Convenient to get a list of strings at the end
-        self.subjectGenotypeComboBox.addItems(prev_values["genotypes"])
-        exists_id = self.subjectGenotypeComboBox.findText(self.subject.genotype)
-        if exists_id >= 0:
-            self.subjectGenotypeComboBox.removeItem(exists_id)
-        self.subjectGenotypeComboBox.insertItem(-1, self.subject.genotype)
         self.subjectGenotypeComboBox.setCurrentIndex(0)
         self.subjectCommentsTextEdit.setText(self.subject.comments)
 
         # DRUG LIST TAB
         self.tableModel = DrugTableModel(data=self.drugList, pumps=self.pumps)
         self.drugTable.setModel(self.tableModel)
+        self.drugTable.setItemDelegate(CachedTextDelegate(self.drugTable))
 
         self.drugTable.doubleClicked.connect(self.edit_entry)
         self.editDrugButton.clicked.connect(self.edit_entry)
         self.addDrugButton.clicked.connect(self.add_entry)
         self.delDrugButton.clicked.connect(self.remove_entry)
-        for i in range(1, self.tableModel.columnCount()):
-            self.drugTable.horizontalHeader().setSectionResizeMode(
-                i, QHeaderView.ResizeToContents
-            )
-        self.drugTable.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        # columns get a fixed width so that Qt does not have to measure
+        # every cell whenever the model changes, only the name column stretches
+        header = self.drugTable.horizontalHeader()
+        for i, width in enumerate(self.tableModel.COLUMN_WIDTHS):
+            if width is None:
+                header.setSectionResizeMode(i, QHeaderView.Stretch)
+            else:
+                header.setSectionResizeMode(i, QHeaderView.Fixed)
+                header.resizeSection(i, width)
 
         # PUMPS TAB
-        if len([p for p in self.pumps if p is not None]) > 0:
+        if len(self.activePumps) > 0:
             self.pumpComboBox.clear()
-            self.pumpComboBox.addItems(
-                [p.display_name for p in self.pumps if p is not None]
-            )
+            self.pumpComboBox.addItems(self.activePumpNames)
             self.pumpComboBox.currentIndexChanged.connect(self.on_pump_combo_changed)
             self.on_pump_combo_changed(0)  # populate with first item in list
 
+    def _probe_pump(self, pump_conf):
+        """
+        connects to the pump described by pump_conf, and checks that it answers.
+        Returns the pump, or None if it did not answer
+        """
+        model = AVAIL_PUMP_MODULES[pump_conf["module-name"]]
+        # sometimes, it takes a couple of tries for the pump to answer,
+        # so we'll try several times and test if it was successful
+        for _ in range(3):
+            try:
+                pump = model(
+                    display_name=pump_conf["display-name"],
+                    serial_port=self.serialPorts[pump_conf["serial-port"]],
+                    **pump_conf["module-args"],
+                )
+                pump.is_running()  # check that pump is working, should raise Exception if not
+                return pump
+            except SyringePumpException:
+                pass
+        return None
+
     def on_pump_combo_changed(self, index):
-        for idx, p in enumerate([q for q in self.pumps if q is not None]):
-            self.pumpComboBox.setItemText(idx, p.display_name)
         clear_layout(self.pumpPanelFrame.layout())
-        pumps = [p for p in self.pumps if p is not None]
-        panel = PumpConfigPanel(pump=pumps[index])
+        panel = PumpConfigPanel(pump=self.activePumps[index])
         self.pumpPanelFrame.layout().addWidget(panel)
 
     def add_entry(self):
         name, dose, concentration, volume, pump, ok = DrugEditDialog.get_drug_data(
-            pumps=[p.display_name for p in self.pumps]
+            pumps=self.pumpNames
         )
         if ok:
-            new_drug = Drug(
-                name=name,
-                dose=dose,
-                concentration=concentration,
-                volume=volume,
-                pump=pump,
+            self.tableModel.append_row(
+                Drug(
+                    name=name,
+                    dose=float(dose),
+                    concentration=float(concentration),
+                    volume=int(volume),
+                    pump=pump,
+                )
             )
-            new_row = self.tableModel.rowCount()
-            self.tableModel.insertRows(new_row)
-
-            for i, field in enumerate(self.tableModel.FIELDS):
-                new_row = self.tableModel.rowCount() - 1
-                ix = self.tableModel.index(new_row, i, QModelIndex())
-                self.tableModel.setData(ix, getattr(new_drug, field), Qt.EditRole)
 
     def edit_entry(self):
         selection_model = self.drugTable.selectionModel()
@@ -1344,17 +1698,26 @@ class StartDialog(QDialog):
 
         for index in indexes:
             row = index.row()
-            drug_data = []
-            for i in range(self.tableModel.columnCount()):
-                ix = self.tableModel.index(row, i, QModelIndex())
-                drug_data.append(self.tableModel.data(ix, Qt.EditRole))
+            drug = self.tableModel.get_row(row)
             name, dose, concentration, volume, pump, ok = DrugEditDialog.get_drug_data(
-                *drug_data, pumps=[p.display_name for p in self.pumps]
+                drug.name,
+                drug.dose,
+                drug.concentration,
+                drug.volume,
+                drug.pump,
+                pumps=self.pumpNames
             )
             if ok:
-                for j, field in enumerate([name, dose, concentration, volume, pump]):
-                    ix = self.tableModel.index(row, j, QModelIndex())
-                    self.tableModel.setData(ix, field, Qt.EditRole)
+                self.tableModel.set_row(
+                    row,
+                    Drug(
+                        name=name,
+                        dose=float(dose),
+                        concentration=float(concentration),
+                        volume=int(volume),
+                        pump=pump,
+                    ),
+                )
 
     def remove_entry(self):
         selection_model = self.drugTable.selectionModel()
@@ -1375,13 +1738,14 @@ class StartDialog(QDialog):
     def accept(self) -> None:
         # Accept new entry in genotype list if necessary
         text = self.subjectGenotypeComboBox.lineEdit().text()
-        pos = self.subjectGenotypeComboBox.findText(text)
-        if pos >= 0:
-            self.subjectGenotypeComboBox.removeItem(pos)
-        self.subjectGenotypeComboBox.insertItem(0, text)
+        genotypes_model: QStringListModel = self.subjectGenotypeComboBox.model()
+        genotypes = [text] + [
+            genotype for genotype in genotypes_model.stringList() if genotype != text
+        ]
+        genotypes_model.setStringList(genotypes)
 
         # save data
-        self.subject.genotype = self.subjectGenotypeComboBox.itemText(0)
+        self.subject.genotype = text
         if self.subjectSexButtonGroup.checkedId() == Sex.MALE:
             self.subject.sex = Sex.MALE
         elif self.subjectSexButtonGroup.checkedId() == Sex.FEMALE:
@@ -1397,8 +1761,9 @@ class StartDialog(QDialog):
         # save the lists genotypes/investigators/drugs upon accepting,
         # so they can be reloaded next time
         out = {
-            "genotypes": self.subjectGenotypeComboBox.model().stringList(),
-            "drugs": [drug.__dict__ for drug in self.drugList],
+            # most recently used genotype first
+            "genotypes": genotypes,
+            "drugs": [drug.as_dict() for drug in self.drugList],
             "pumps": [
                 {
                     "bolus_rate": pump.bolus_rate,
@@ -1407,8 +1772,12 @@ class StartDialog(QDialog):
                 for pump in self.pumps
             ],
         }
-        with open(self._prev_values_file, "w", encoding="utf-8") as f:
-            json.dump(out, f)
+        payload = _json_dumps(out)
+        payload_hash = hashlib.blake2b(payload, digest_size=16).digest()
+        if payload_hash != self._prev_values_hash:
+            with open(self._prev_values_file, "wb") as f:
+                f.write(payload)
+            self._prev_values_hash = payload_hash
 
         super().accept()
 
@@ -1425,9 +1794,17 @@ class PumpConfigPanel(QWidget):
 
     def __init__(self, pump: SyringePump):
         super().__init__()
-        uic.loadUi("./GUI/SyringePumpPanel.ui", self)
+        load_ui(os.path.join(GUI_FOLDER, "SyringePumpPanel.ui"), self)
         self.pump = pump
-        self._waitThread = threading.Thread()
+        # follows the priming from the GUI thread, until the pump stops
+        self._primeTargetVolume = 0.0  # in μL
+        self._progressTimer = QTimer(self)
+        self._progressTimer.setInterval(100)
+        self._progressTimer.timeout.connect(self._update_progress)
+        # last rate (value, units) and target volume (in mL) sent to the pump, so that update_pump() only talks
+        # to the pump when they changed
+        self._lastRate = None
+        self._lastTargetVolume = None
         self.refresh()
         self.doPrimeButton.clicked.connect(self.on_prime_toggled)
         self.diameterSpinBox.editingFinished.connect(self.update_pump)
@@ -1438,18 +1815,38 @@ class PumpConfigPanel(QWidget):
         self.primeTargetVolSpinBox.editingFinished.connect(self.update_pump)
 
     def refresh(self):
-        possible_units = self.pump.get_possible_units()
-        self.bolusRateComboBox.clear()
-        self.bolusRateComboBox.addItems(possible_units)
-        self.primeFlowRateComboBox.clear()
-        self.primeFlowRateComboBox.addItems(possible_units)
-
-        self.diameterSpinBox.setValue(self.pump.get_diameter_mm())
-        self.bolusRateSpinBox.setValue(self.pump.bolus_rate)
-        self.bolusRateComboBox.setCurrentIndex(self.pump.bolus_rate_units)
-        self.primeTargetVolSpinBox.setValue(self.pump.get_target_volume_uL() / 1e3)
-        self.primeFlowRateSpinBox.setValue(self.pump.get_rate())
-        self.primeFlowRateComboBox.setCurrentIndex(self.pump.get_units())
+        # the widgets only reflect the state of the pump here, nothing must be sent back to it through update_pump()
+        with contextlib.ExitStack() as blockers:
+            for widget in (
+                    self.diameterSpinBox,
+                    self.bolusRateSpinBox,
+                    self.bolusRateComboBox,
+                    self.primeTargetVolSpinBox,
+                    self.primeFlowRateSpinBox,
+                    self.primeFlowRateComboBox,
+            ):
+                blockers.enter_context(QSignalBlocker(widget))
+            possible_units = self.pump.get_possible_units()
+            set_units_model(self.bolusRateComboBox, possible_units)
+            set_units_model(self.primeFlowRateComboBox, possible_units)
+
+            for widget, value in (
+                    (self.diameterSpinBox, self.pump.get_diameter_mm()),
+                    (self.bolusRateSpinBox, self.pump.bolus_rate),
+                    (self.primeTargetVolSpinBox, self.pump.get_target_volume_uL() / 1e3),
+                    (self.primeFlowRateSpinBox, self.pump.get_rate()),
+            ):
+                if widget.value() != value:
+                    widget.setValue(value)
+            for widget, index in (
+                    (self.bolusRateComboBox, self.pump.bolus_rate_units),
+                    (self.primeFlowRateComboBox, self.pump.get_units()),
+            ):
+                if widget.currentIndex() != index:
+                    widget.setCurrentIndex(index)
+        # the widgets now show what is in the pump
+        self._lastRate = self.primeFlowRateSpinBox.value(), self.primeFlowRateComboBox.currentIndex()
+        self._lastTargetVolume = self.primeTargetVolSpinBox.value()
 
     # noinspection PyUnusedLocal
     def update_pump(self, event=None):
@@ -1457,10 +1854,16 @@ class PumpConfigPanel(QWidget):
         # and with currentIndexChanged, which sends an argument, so we provide a default value for the argument
         self.pump.bolus_rate = self.bolusRateSpinBox.value()
         self.pump.bolus_rate_units = self.bolusRateComboBox.currentIndex()
-        self.pump.set_rate(
-            self.primeFlowRateSpinBox.value(), self.primeFlowRateComboBox.currentIndex()
-        )
-        self.pump.set_target_volume_uL(self.primeTargetVolSpinBox.value() * 1e3)
+        # editingFinished is also emitted when simply tabbing through the spin boxes,
+        # only send the values to the pump when they actually changed
+        rate = self.primeFlowRateSpinBox.value(), self.primeFlowRateComboBox.currentIndex()
+        if rate != self._lastRate:
+            self.pump.set_rate(*rate)
+            self._lastRate = rate
+        target_volume = self.primeTargetVolSpinBox.value()
+        if target_volume != self._lastTargetVolume:
+            self.pump.set_target_volume_uL(target_volume * 1e3)
+            self._lastTargetVolume = target_volume
 
     # noinspection PyUnusedLocal
     def on_prime_toggled(self, clicked):
@@ -1468,9 +1871,7 @@ class PumpConfigPanel(QWidget):
             try:
                 if self.pump.is_running():
                     self.pump.stop()
-                    # wait for thread to finish
-                    while self._waitThread.is_alive():
-                        time.sleep(0.1)
+                    self._progressTimer.stop()
                 self.pump.set_direction(SyringePump.STATE.INFUSING)
                 self.pump.clear_accumulated_volume()
                 self.pump.set_rate(
@@ -1480,6 +1881,8 @@ class PumpConfigPanel(QWidget):
                 self.pump.set_target_volume_uL(
                     self.primeTargetVolSpinBox.value() * 1e3
                 )  # volume is in μL but dlg box is in mL
+                self._lastRate = self.primeFlowRateSpinBox.value(), self.primeFlowRateComboBox.currentIndex()
+                self._lastTargetVolume = self.primeTargetVolSpinBox.value()
                 self.pump.start()
             except SyringePumps.SyringePumpValueOORException:
                 # noinspection PyTypeChecker
@@ -1492,38 +1895,31 @@ class PumpConfigPanel(QWidget):
                 # if target vol is zero, continuous perfusion, so we don't run the
                 # progress bar and don't wait for the perfusion to end.
                 self.primeProgressBar.setValue(0)
-                self._waitThread = threading.Thread(
-                    target=self.wait_for_end_of_injection,
-                    args=(),
-                )
-                self._waitThread.start()
+                self._primeTargetVolume = self.primeTargetVolSpinBox.value() * 1e3  # convert mL for dialog box to μL
+                self._progressTimer.start()
         else:
             if self.pump.is_running():
                 self.pump.stop()
-                # wait for thread to finish
-                while self._waitThread.is_alive():
-                    time.sleep(0.1)
+            self._progressTimer.stop()
             self.enable_prime_controls(True)
 
-    def wait_for_end_of_injection(
-            self,
-    ):
-        while self.pump.is_running():
-            self.primeProgressBar.setValue(
-                round(
-                    100
-                    * self.pump.get_accumulated_volume_uL()
-                    / (
-                            self.primeTargetVolSpinBox.value() * 1e3
-                    )  # convert mL for dialog box to μL
+    def _update_progress(self):
+        try:
+            is_running = self.pump.is_running()
+            if is_running:
+                self.primeProgressBar.setValue(
+                    round(100 * self.pump.get_accumulated_volume_uL() / self._primeTargetVolume)
                 )
-            )
-            time.sleep(0.1)
-
-        # return to zero when finished
-        self.primeProgressBar.setValue(0)
-        self.doPrimeButton.setChecked(False)
-        self.enable_prime_controls(True)
+        except (SyringePumpException, serial.SerialException, OSError):
+            # the priming can no longer be followed, stop monitoring it and give the controls back to the user
+            logger.exception("error while monitoring the priming of the pump")
+            is_running = False
+        if not is_running:
+            self._progressTimer.stop()
+            # return to zero when finished
+            self.primeProgressBar.setValue(0)
+            self.doPrimeButton.setChecked(False)
+            self.enable_prime_controls(True)
 
     def enable_prime_controls(self, enabled: bool):
         self.primeTargetVolSpinBox.setEnabled(enabled)
@@ -1,6 +1,14 @@
 from PyQt5 import QtCore
-from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
-from PyQt5.QtWidgets import QStyledItemDelegate, QWidget, QDoubleSpinBox
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QPointF
+from PyQt5.QtGui import QStaticText, QPalette, QPainter
+from PyQt5.QtWidgets import (
+    QStyledItemDelegate,
+    QWidget,
+    QDoubleSpinBox,
+    QStyleOptionViewItem,
+    QStyle,
+    QApplication,
+)
 
 from misc import Drug
 
@@ -35,17 +43,82 @@ class DoubleSpinBoxDelegate(QStyledItemDelegate):
         editor.setGeometry(option.rect)
 
 
+class CachedTextDelegate(QStyledItemDelegate):
+    """
+    Paints the cell text with a QStaticText, so that its layout is only computed once per text
+    instead of on every repaint. The background, selection and focus are still drawn by the style.
+    """
+
+    MAX_CACHED_TEXTS = 1000  # resizing the columns creates new entries, start over when there are too many
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._staticTexts = {}  # (text, available width) -> QStaticText
+
+    def paint(
+        self, painter: QPainter, option: QStyleOptionViewItem, index: QtCore.QModelIndex
+    ) -> None:
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        text = opt.text
+        opt.text = ""
+        style = QApplication.style() if opt.widget is None else opt.widget.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+        if len(text) == 0:
+            return
+
+        text_rect = style.subElementRect(QStyle.SE_ItemViewItemText, opt, opt.widget)
+        # same margin as the default delegate
+        margin = style.pixelMetric(QStyle.PM_FocusFrameHMargin, None, opt.widget) + 1
+        width = text_rect.width() - 2 * margin
+        static_text = self._staticTexts.get((text, width))
+        if static_text is None:
+            if len(self._staticTexts) >= self.MAX_CACHED_TEXTS:
+                self._staticTexts.clear()
+            static_text = QStaticText(opt.fontMetrics.elidedText(text, opt.textElideMode, width))
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+            self._staticTexts[text, width] = static_text
+
+        group = QPalette.Normal if opt.state & QStyle.State_Enabled else QPalette.Disabled
+        role = QPalette.HighlightedText if opt.state & QStyle.State_Selected else QPalette.Text
+        painter.save()
+        painter.setClipRect(text_rect)
+        painter.setFont(opt.font)
+        painter.setPen(opt.palette.color(group, role))
+        # vertically centered
+        top = text_rect.top() + (text_rect.height() - static_text.size().height()) / 2
+        painter.drawStaticText(QPointF(text_rect.left() + margin, top), static_text)
+        painter.restore()
+
+
 class DrugTableModel(QAbstractTableModel):
     HEADER = ["Name", "Dose", "Concentration", "Inj. volume", "Pump"]
     FIELDS = ["name", "dose", "concentration", "volume", "pump"]
     UNITS = [None, "mg/kg", "mg/mL", "μL", None]
     FORMATS = ["{:s}", "{:.2f}", "{:.2f}", "{:d}", "{}"]
+    # fixed width of the columns (in px), so that the views do not measure every cell. None stretches the column
+    COLUMN_WIDTHS = [None, 100, 140, 110, 100]
+    # bound format methods and units suffixes, so that nothing is rebuilt for each cell
+    _FORMATTERS = tuple(fmt.format for fmt in FORMATS)
+    _SUFFIXES = tuple("" if not units else f" {units}" for units in UNITS)
+    # flags of the cells of each column, the pump column cannot be edited in place
+    _COLUMN_FLAGS = tuple(
+        Qt.ItemFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemNeverHasChildren)
+        if column == 4
+        else Qt.ItemFlags(
+            Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemNeverHasChildren | Qt.ItemIsEditable
+        )
+        for column in range(len(HEADER))
+    )
 
     def __init__(self, data=None, pumps=None):
         QAbstractTableModel.__init__(self)
         self._data = [] if data is None else data
         self._pumps = [] if pumps is None else pumps
         self.NCols = len(self.HEADER)
+        # (row, column) -> displayed text, the views ask for it on every repaint
+        self._displayCache = {}
 
     def rowCount(self, parent=QModelIndex()):
         return len(self._data)
@@ -58,21 +131,24 @@ class DrugTableModel(QAbstractTableModel):
         row = index.row()
 
         if role == Qt.DisplayRole:
-            value = self._data[row].as_list()[column]
-            if column == 4:
-                if value is None:
-                    return "Manual"
-                else:
-                    return self._pumps[value].display_name
-            value = self.FORMATS[column].format(value)
-            units = self.UNITS[column]
-            if units is not None and len(units) > 0:
-                value = "{} {}".format(value, units)
-            return value
+            text = self._displayCache.get((row, column))
+            if text is None:
+                text = self._display_text(row, column)
+                self._displayCache[row, column] = text
+            return text
         elif role == Qt.EditRole:
-            return self._data[row].as_list()[column]
+            return getattr(self._data[row], self.FIELDS[column])
         return None
 
+    def _display_text(self, row, column):
+        value = getattr(self._data[row], self.FIELDS[column])
+        if column == 4:
+            if value is None:
+                return "Manual"
+            else:
+                return self._pumps[value].display_name
+        return self._FORMATTERS[column](value) + self._SUFFIXES[column]
+
     def headerData(
         self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole
     ):
@@ -90,6 +166,7 @@ class DrugTableModel(QAbstractTableModel):
 
         for row in range(rows):
             self._data.insert(position + row, Drug())
+        self._forget_rows_from(position)
 
         self.endInsertRows()
         return True
@@ -99,10 +176,39 @@ class DrugTableModel(QAbstractTableModel):
         self.beginRemoveRows(QModelIndex(), position, position + rows - 1)
 
         del self._data[position : position + rows]
+        self._forget_rows_from(position)
 
         self.endRemoveRows()
         return True
 
+    def _forget_rows_from(self, position):
+        # the rows from position on have moved, the displayed text of the rows above is still valid
+        for key in [key for key in self._displayCache if key[0] >= position]:
+            del self._displayCache[key]
+
+    def append_row(self, drug: Drug):
+        """Add a drug at the end of the model."""
+        position = len(self._data)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._data.append(drug)
+        self.endInsertRows()
+
+    def get_row(self, row: int) -> Drug:
+        """Return the drug at <row>."""
+        return self._data[row]
+
+    def set_row(self, row: int, drug: Drug):
+        """Replace the drug at <row>, notifying the views once for the whole row."""
+        self._data[row] = drug
+        for column in range(self.NCols):
+            self._displayCache.pop((row, column), None)
+        # noinspection PyUnresolvedReferences
+        self.dataChanged.emit(
+            self.index(row, 0),
+            self.index(row, self.NCols - 1),
+            [Qt.DisplayRole, Qt.EditRole],
+        )
+
     def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
         """Adjust the data (set it to <value>) depending on the given
         index and role.
@@ -119,6 +225,7 @@ class DrugTableModel(QAbstractTableModel):
                 setattr(drug, self.FIELDS[index.column()], value)
             except ValueError:
                 return False
+            self._displayCache.pop((index.row(), index.column()), None)
             # noinspection PyUnresolvedReferences
             self.dataChanged.emit(index, index)
             return True
@@ -128,8 +235,4 @@ class DrugTableModel(QAbstractTableModel):
     def flags(self, index):
         if not index.isValid():
             return Qt.ItemIsEnabled
-        if index.column() == 4:
-            return Qt.ItemFlags(
-                QAbstractTableModel.flags(self, index) | ~Qt.ItemIsEditable
-            )
-        return Qt.ItemFlags(QAbstractTableModel.flags(self, index) | Qt.ItemIsEditable)
+        return self._COLUMN_FLAGS[index.column()]
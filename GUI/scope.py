@@ -5,7 +5,6 @@ import logging
 import os
 
 import numpy as np
-import pygame
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (
     QMenu,
@@ -17,8 +16,19 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5 import QtCore, QtGui
 
+from GUI.sounds import load_sound, reserve_channel
 from sampling.buffers import RollingBuffer
 
+try:
+    from numba import njit
+except ModuleNotFoundError:
+    # numba is optional: without it, the functions below simply run as regular python code
+    # noinspection PyUnusedLocal
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 BACKGROUND_COLOR = (226, 226, 226)
 AXES_COLOR = (0, 0, 0)
 
@@ -52,11 +62,6 @@ pg.setConfigOptions(
     antialias=False
 )  # WARNING: setting to True could slow down execution
 
-# if it hasn't been already, initialize the sound mixer
-if pygame.mixer.get_init() is None:
-    pygame.mixer.pre_init(44100, -16, 2, 2048)
-    pygame.mixer.init()
-
 logger = logging.getLogger(__name__)
 
 
@@ -115,6 +120,9 @@ class ScrollingScope(pg.PlotItem):
         self._trendWindowSize = trend_window_size
         self._trendPeriod = trend_period
         self._trendFunction = self._selectTrendFunction(trend_function)
+        if self._trendFunction is not None:
+            # pay the compilation cost of the jit-compiled helpers now rather than on the first trend update
+            _precompile_kernels()
         self._trendFuncKwargs = trend_func_kwargs
         self._trendUnits = trend_units
         self._trendAutoscale = trend_autoscale
@@ -126,15 +134,20 @@ class ScrollingScope(pg.PlotItem):
         self._alarmTripped = False
         self._alarmMuted = False
         self._alarmBGColor_alarm = alarm_bg_color
+        # the decoded sound is shared with the other alarms using the same file, each alarm plays on its own channel
         if alarm_sound_file is not None and os.path.isfile(alarm_sound_file):
-            self._alarmSound = pygame.mixer.Sound(alarm_sound_file)
+            self._alarmSound = load_sound(alarm_sound_file)
+            self._alarmChannel = reserve_channel()
         else:
             self._alarmSound = None
+            self._alarmChannel = None
 
         self._bufferSize = int(window_size * sample_freq)
-        self._buffer = np.zeros((self._bufferSize,))
+        self._allocateBuffer()
         self._xArray = np.linspace(0, self._windowSize, num=self._bufferSize)
         self._curve = self.plot(x=self._xArray, y=self._buffer)
+        # there are usually many more points than pixels: only the min and max of the points sharing a pixel are drawn
+        self._curve.setDownsampling(auto=True, method="peak")
         self._leftAxis = self.getAxis("left")
         self._rightAxis = self.getAxis("right")
         self._bottomAxis = self.getAxis("bottom")
@@ -169,7 +182,9 @@ class ScrollingScope(pg.PlotItem):
         # init Trend Plot
         #
         self._trendBuffer = RollingBuffer(size=self._trendPeriod * self._sampleFreq)
-        self._trendData = np.zeros((round(self._trendWindowSize / self._trendPeriod),))
+        self._trendRing = np.zeros((2 * round(self._trendWindowSize / self._trendPeriod),))
+        self._trendRingIndex = 0
+        self._trendData = self._trendRing[: self._trendRing.size // 2]
         self._trendXArray = np.linspace(
             0.0, self._trendWindowSize, num=self._trendData.size
         )
@@ -209,8 +224,9 @@ class ScrollingScope(pg.PlotItem):
         # to keep the two plots in sync
         self.vb.sigResized.connect(self.onResize)
         # measurement display
+        self._trendTextFormat = "{:.1f} " + str(self._trendUnits)
         self._trendText = pg.TextItem(
-            text="{:.1f} {!s}".format(0.0, self._trendUnits),
+            text=self._trendTextFormat.format(0.0),
             color=self._trendLineColor,
             anchor=(1, 1),
         )
@@ -228,6 +244,8 @@ class ScrollingScope(pg.PlotItem):
         self._trendTimer = QtCore.QTimer()
         # noinspection PyUnresolvedReferences
         self._trendTimer.timeout.connect(self.onTrendTimer)
+        self._trendWorker = TrendWorker(self._trendFunction, self._trendFuncKwargs)
+        self._trendWorker.resultReady.connect(self._applyTrendResult)
 
         #
         # Trend vlines
@@ -268,20 +286,26 @@ class ScrollingScope(pg.PlotItem):
     def start(self):
         self._trendTimer.start(self._trendPeriod * 1000)
 
+    def stop(self):
+        self._trendTimer.stop()
+        self._trendWorker.wait()
+
     def onResize(self):
         self._trendVB.setGeometry(self.vb.sceneBoundingRect())
 
     def onTrendTimer(self):
         # logger.debug("in ScrollingPlot.onTrendTimer()")
         if self.trendEnabled:
-            ret_val = self._trendFunction(
-                self._trendBuffer.values().flatten(), **self._trendFuncKwargs
-            )
-            self._trendText.setPlainText("{:.1f} {!s}".format(ret_val, self._trendUnits))
-            self._trendData = np.roll(
-                self._trendData, -1
-            )  # shifts data along axis 1 N points to the left
-            self._trendData[-1:] = ret_val
+            # the trend function runs in the background, its result is then handled by _applyTrendResult.
+            # It gets its own copy of the data, since the trend buffer keeps being written while it runs
+            self._trendWorker.compute(self._trendBuffer.values().flatten())
+
+    def _applyTrendResult(self, ret_val):
+        if self.trendEnabled:
+            # setPlainText does nothing when the text is unchanged
+            self._trendText.setPlainText(self._trendTextFormat.format(ret_val))
+            self._trendRingIndex = _ring_append(self._trendRing, self._trendRingIndex, ret_val)
+            self._trendData = _ring_view(self._trendRing, self._trendRingIndex)
             self._trendCurve.setData(x=self._trendXArray, y=self._trendData)
 
             # move the trend_vlines
@@ -299,15 +323,12 @@ class ScrollingScope(pg.PlotItem):
 
             # deal with alarm conditions
             if self.alarmEnabled:
-                if ret_val > self._alarmHigh and not np.isnan(ret_val):
+                # comparisons with NaN are always False, so a NaN trend value never trips the alarm
+                if ret_val > self._alarmHigh or ret_val < self._alarmLow:
                     if not self._alarmTripped:
                         # logger.debug(
-                        #     "Trend value reached %.2f, which is > %.2f. Tripping alarm" % (ret_val, self.alarmHigh))
-                        self.tripAlarm()
-                elif ret_val < self._alarmLow and not np.isnan(ret_val):
-                    if not self._alarmTripped:
-                        # logger.debug(
-                        #     "Trend value reached %.2f, which is < %.2f. Tripping alarm" % (ret_val, self.alarmLow))
+                        #     "Trend value %.2f is outside [%.2f, %.2f]. Tripping alarm" %
+                        #     (ret_val, self.alarmLow, self.alarmHigh))
                         self.tripAlarm()
                 else:
                     # value is between alarmLow and alarmHigh
@@ -349,8 +370,18 @@ class ScrollingScope(pg.PlotItem):
     def trendEnabled(self):
         return self._trendFunction is not None
 
+    def _allocateBuffer(self):
+        # the displayed data lives twice in a ring of twice its size, so the last _bufferSize points
+        # are always available, in order, as a contiguous view (see _ring_append)
+        self._ring = np.zeros((2 * self._bufferSize,))
+        self._ringIndex = 0
+        self._buffer = self._ring[: self._bufferSize]
+
     def _rescaleData(self, chunk):
-        return np.array(self._offset + self._scaling * np.array(chunk))
+        # a single new array, scaled then offset in place
+        data = np.multiply(chunk, self._scaling, dtype=np.float64)
+        data += self._offset
+        return data
 
     def append(self, chunk):
         """
@@ -359,11 +390,9 @@ class ScrollingScope(pg.PlotItem):
         :return: noting
         """
         chunk = self._rescaleData(chunk)  # converts data in real units
-        chunk_length = chunk.size
-        self._buffer = np.roll(
-            self._buffer, -chunk_length
-        )  # shifts data along axis 1 chunk_length points to the left
-        self._buffer[-chunk_length:] = chunk
+        # shifts data chunk.size points to the left, without moving the points already stored
+        self._ringIndex = _ring_append(self._ring, self._ringIndex, chunk)
+        self._buffer = _ring_view(self._ring, self._ringIndex)
         self._curve.setData(x=self._xArray, y=self._buffer)
 
         # add data to trend buffer
@@ -417,7 +446,7 @@ class ScrollingScope(pg.PlotItem):
             self._alarmTripped = True
             self.setBackgroundColor(self._alarmBGColor_alarm)
             if self._alarmSound is not None:
-                self._alarmSound.play(-1)
+                self._alarmChannel.play(self._alarmSound, loops=-1)
                 self._alarmMuted = False
 
     def resetAlarm(self):
@@ -425,7 +454,7 @@ class ScrollingScope(pg.PlotItem):
         self._alarmTripped = False
         self.setBackgroundColor(self._bgColor)
         if self._alarmSound is not None:
-            self._alarmSound.stop()
+            self._alarmChannel.stop()
             self._alarmMuted = False
             self._muteButton.setVisible(False)
 
@@ -433,7 +462,7 @@ class ScrollingScope(pg.PlotItem):
         # logger.debug("in muteAlarm()")
         if self._alarmEnabled and self._alarmTripped:
             if self._alarmSound is not None:
-                self._alarmSound.stop()
+                self._alarmChannel.stop()
                 self._alarmMuted = True
                 self._muteButton.setVisible(True)
 
@@ -441,7 +470,7 @@ class ScrollingScope(pg.PlotItem):
         # logger.debug("in unMuteAlarm()")
         if self._alarmEnabled and self._alarmTripped and self._alarmMuted:
             if self._alarmSound is not None:
-                self._alarmSound.play(-1)
+                self._alarmChannel.play(self._alarmSound, loops=-1)
                 self._alarmMuted = False
                 self._muteButton.setVisible(False)
 
@@ -561,12 +590,34 @@ class ScrollingScope(pg.PlotItem):
 
         self.vb.menu.addMenu(self.vb.menuAlarm)
         self.vb.menu.addMenu(self.vb.menuYAxis)
+        self.vb.menu.aboutToShow.connect(self._syncMenu)
         return self.vb.menu
 
+    def _syncMenu(self):
+        """
+        the menu is only built once: this updates it with the current settings before it is shown
+        """
+        settings = (
+            (self.vb.menuAlarmEnabled, self.vb.menuAlarmEnabled.setChecked, self.alarmEnabled),
+            (self.vb.menuAlarmLimits.lowSpin, self.vb.menuAlarmLimits.lowSpin.setValue, self.alarmLow),
+            (self.vb.menuAlarmLimits.highSpin, self.vb.menuAlarmLimits.highSpin.setValue, self.alarmHigh),
+            (self.vb.menuYAxisAutoscaleEnabled, self.vb.menuYAxisAutoscaleEnabled.setChecked, self.autoscale),
+            (self.vb.menuYAxisLimits.lowSpin, self.vb.menuYAxisLimits.lowSpin.setValue, self.ymin),
+            (self.vb.menuYAxisLimits.highSpin, self.vb.menuYAxisLimits.highSpin.setValue, self.ymax),
+            (self.vb.menuTrendAxisLimits.lowSpin, self.vb.menuTrendAxisLimits.lowSpin.setValue, self._trendYmin),
+            (self.vb.menuTrendAxisLimits.highSpin, self.vb.menuTrendAxisLimits.highSpin.setValue, self._trendYmax),
+        )
+        for widget, setter, value in settings:
+            # the settings are already applied, there is no need to go through the menu callbacks
+            widget.blockSignals(True)
+            setter(value)
+            widget.blockSignals(False)
+        self.vb.menuYAxisLimits.lowSpin.setEnabled(not self.autoscale)
+        self.vb.menuYAxisLimits.highSpin.setEnabled(not self.autoscale)
+
     def _raiseContextMenu(self, ev):
-        menu = self._createMenu()
         pos = ev.screenPos()
-        menu.popup(QtCore.QPoint(int(pos.x()), int(pos.y())))
+        self.vb.menu.popup(QtCore.QPoint(int(pos.x()), int(pos.y())))
 
     @property
     def acquisition_module_index(self):
@@ -589,6 +640,35 @@ class ScrollingScope(pg.PlotItem):
             self._trend_vlines.append(vline)
 
 
+class TrendWorker(QtCore.QThread):
+    """
+    computes the trend values in the background, so that a slow trend function does not freeze the GUI.
+    The value computed is sent with resultReady
+    """
+
+    resultReady = QtCore.pyqtSignal(float)
+
+    def __init__(self, function, func_kwargs, parent=None):
+        super().__init__(parent)
+        self._function = function
+        self._funcKwargs = func_kwargs
+        self._data = None
+
+    def compute(self, data):
+        """
+        starts computing the trend value of data, unless the previous value is still being computed.
+        returns whether the computation was started
+        """
+        if self.isRunning():
+            return False
+        self._data = data
+        self.start()
+        return True
+
+    def run(self):
+        self.resultReady.emit(float(self._function(self._data, **self._funcKwargs)))
+
+
 class MenuLowHighSpinAction(QWidgetAction):
     def __init__(
             self,
@@ -647,7 +727,6 @@ class PagedScope(ScrollingScope):
         super(PagedScope, self).__init__(*args, **kwargs)
         # handles cases where persistence is set to None
         self._persistence = persistence if persistence is not None else 0
-        self._buffer = np.array([])
         self._curve.setZValue(
             self._persistence + 10
         )  # ensure main curves stays on top of the persistent ones
@@ -685,6 +764,11 @@ class PagedScope(ScrollingScope):
         else:
             self._trigMark.setPos(left_edge, bottom)
 
+    def _allocateBuffer(self):
+        # pages are not scrolled, so there is no ring: the current page is written in place, up to _fill points
+        self._buffer = np.zeros((self._bufferSize,))
+        self._fill = 0
+
     def _autoDefineThreshold(self):
         # logger.debug("trying to determine threshold automatically")
         ret_val = 0.0
@@ -714,18 +798,20 @@ class PagedScope(ScrollingScope):
             self._trigLevel = self._autoDefineThreshold()
             self._trigMark.setPos(0, self._trigLevel)
         if self._trigMode.upper() == "RISING":
-            (a,) = np.where(chunk > self._trigLevel)
-            if len(a) > 0 and a[0] > 0 and chunk[a[0] - 1] <= self._trigLevel:
-                # logger.debug("Threshold crossed at index %d. returning %d points ", a[0], len(chunk[a[0]:]))
-                return chunk[a[0]:]
+            crossed = chunk > self._trigLevel
+            i = int(np.argmax(crossed))  # first crossing, 0 if there is none
+            if crossed[i] and i > 0 and chunk[i - 1] <= self._trigLevel:
+                # logger.debug("Threshold crossed at index %d. returning %d points ", i, len(chunk[i:]))
+                return chunk[i:]
             else:
                 # logger.debug("Threshold NOT crossed. scrapping chunk.")
                 return np.array([])
         elif self._trigMode.upper() == "FALLING":
-            (a,) = np.where(chunk < self._trigLevel)
-            if len(a) > 0 and a[0] > 0 and chunk[a[0] - 1] >= self._trigLevel:
-                # logger.debug("Threshold crossed at index %d. returning %d points ", a[0], len(chunk[a[0]:]))
-                return chunk[a[0]:]
+            crossed = chunk < self._trigLevel
+            i = int(np.argmax(crossed))  # first crossing, 0 if there is none
+            if crossed[i] and i > 0 and chunk[i - 1] >= self._trigLevel:
+                # logger.debug("Threshold crossed at index %d. returning %d points ", i, len(chunk[i:]))
+                return chunk[i:]
             else:
                 # logger.debug("Threshold NOT crossed. scrapping chunk.")
                 return np.array([])
@@ -746,38 +832,37 @@ class PagedScope(ScrollingScope):
         )  # keep a copy of the data for trigger level
         self._trendBuffer.append(scaled_chunk)  # add data to trend buffer
 
-        if self._buffer.size == 0:  # no data in main curve yet
-            scaled_chunk = self._waitForTrigger(scaled_chunk)
-
-        if self._buffer.size + chunk_length <= self._bufferSize:
-            self._buffer = np.concatenate([self._buffer, scaled_chunk])
-            self._curve.setData(
-                x=np.linspace(
-                    0.0, float(self._buffer.size) / self._sampleFreq, self._buffer.size
-                ),
-                y=self._buffer,
-            )
-        else:
-            points_to_add = self._bufferSize - self._buffer.size
-            points_left = chunk_length - points_to_add
-            temp = np.concatenate([self._buffer, scaled_chunk[:points_to_add]])
-            # create a new persistent curve
-            curve = self.plot(x=self._xArray, y=temp)
-            curve.setPen(color=self._lineColor, width=self._lineWidth / 2)
+        while scaled_chunk.size > 0:
+            if self._fill == self._bufferSize:
+                self._persistPage()
+            if self._fill == 0:  # no data in main curve yet
+                scaled_chunk = self._waitForTrigger(scaled_chunk)
+            points_to_add = min(scaled_chunk.size, self._bufferSize - self._fill)
+            self._buffer[self._fill: self._fill + points_to_add] = scaled_chunk[:points_to_add]
+            self._fill += points_to_add
+            scaled_chunk = scaled_chunk[points_to_add:]
+        self._curve.setData(x=self._xArray[: self._fill], y=self._buffer[: self._fill])
+
+    def _persistPage(self):
+        """
+        turns the full page into a persistent curve and starts a new page.
+        once there are enough persistent curves, the oldest one is reused for the new one
+        """
+        if self._persistence > 0:
+            if len(self._persistCurves) < self._persistence:
+                curve = self.plot()
+                curve.setPen(self._lineColor)
+                curve.setDownsampling(auto=True, method="peak")
+            else:
+                curve = self._persistCurves.popleft()
+            curve.setData(x=self._xArray, y=self._buffer.copy())
             self._persistCurves.append(curve)
             n_curves = len(self._persistCurves)
             for i, curve in enumerate(self._persistCurves):
                 curve.setZValue(i)
                 alpha = 1.0 - (i + 1) * 1.0 / (n_curves + 1)
-                curve.setPen(self._lineColor)
                 curve.setAlpha(alpha, alpha)
-
-            if len(self._persistCurves) > self._persistence:
-                curve_to_delete = self._persistCurves.popleft()
-                self.removeItem(curve_to_delete)
-
-            self._buffer = np.array([])
-            self.append(chunk[-points_left:])
+        self._fill = 0
 
 
 class ScopeLayoutWidget(pg.GraphicsLayoutWidget):
@@ -814,13 +899,11 @@ def peakdet(v, delta, x=None):
     :param v:
 
     """
-    maxtab = []
-    mintab = []
-
     if x is None:
         x = np.arange(len(v))
 
-    v = np.asarray(v)
+    v = np.asarray(v, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
 
     if len(v) != len(x):
         raise ValueError("Input vectors v and x must have same length")
@@ -831,12 +914,58 @@ def peakdet(v, delta, x=None):
     if delta < 0:
         raise ValueError("Input argument delta must be positive")
 
-    mn, mx = np.Inf, -np.Inf
-    mnpos, mxpos = np.NaN, np.NaN
+    return _peakdet_core(v, x, float(delta))
+
+
+def _ring_append(ring, index, values):
+    """
+    writes values in a ring that stores each point twice, at index i and i + n, n being half the ring size.
+    returns the index at which the next values will be written
+    """
+    values = np.ravel(values)
+    n = ring.size // 2
+    if values.size >= n:
+        # only the last n points are kept anyway
+        ring[:n] = values[-n:]
+        ring[n:] = values[-n:]
+        return 0
+    end = index + values.size
+    if end <= n:
+        ring[index:end] = values
+        ring[index + n: end + n] = values
+    else:
+        split = n - index
+        ring[index:n] = values[:split]
+        ring[index + n:] = values[:split]
+        ring[: end - n] = values[split:]
+        ring[n:end] = values[split:]
+    return end % n
+
+
+def _ring_view(ring, index):
+    # the n points written last, oldest first, without copying them
+    return ring[index: index + ring.size // 2]
+
+
+# noinspection SpellCheckingInspection
+@njit(cache=True, nogil=True)
+def _peakdet_core(v, x, delta):
+    """
+    scanning loop of peakdet(), compiled with numba when it is available.
+    v and x must be float64 arrays of the same length. Returns two (n, 2) arrays
+    """
+    # maxima and minima alternate, so there cannot be more than len(v) // 2 + 1 of each
+    maxtab = np.empty((len(v) // 2 + 1, 2))
+    mintab = np.empty((len(v) // 2 + 1, 2))
+    nb_max = 0
+    nb_min = 0
+
+    mn, mx = np.inf, -np.inf
+    mnpos, mxpos = np.nan, np.nan
 
     lookformax = True
 
-    for i in np.arange(len(v)):
+    for i in range(len(v)):
         this = v[i]
         if this > mx:
             mx = this
@@ -847,18 +976,37 @@ def peakdet(v, delta, x=None):
 
         if lookformax:
             if this < (mx - delta):
-                maxtab.append((mxpos, mx))
+                maxtab[nb_max, 0] = mxpos
+                maxtab[nb_max, 1] = mx
+                nb_max += 1
                 mn = this
                 mnpos = x[i]
                 lookformax = False
         else:
             if this > (mn + delta):
-                mintab.append((mnpos, mn))
+                mintab[nb_min, 0] = mnpos
+                mintab[nb_min, 1] = mn
+                nb_min += 1
                 mx = this
                 mxpos = x[i]
                 lookformax = True
 
-    return np.array(maxtab), np.array(mintab)
+    return maxtab[:nb_max], mintab[:nb_min]
+
+
+def _rms(v):
+    # the dot product sums the squares without building an array of them
+    v = np.ravel(v)
+    return np.sqrt(np.dot(v, v) / v.size)
+
+
+def _precompile_kernels():
+    # calling the jit-compiled functions once triggers their compilation (or loads them from cache)
+    peakdet(np.zeros((3,)), 0.0)
+
+
+# random generator of trend_random()
+_rng = np.random.default_rng()
 
 
 # noinspection PyUnusedLocal
@@ -866,7 +1014,7 @@ def trend_random(in_data, **kwargs):
     # logger.debug("in Scope.trend_random(). Received in_data, kwargs=%s", kwargs)
     min_val = kwargs.pop("min_val", 0.0)
     max_val = kwargs.pop("max_val", 1.0)
-    return (max_val - min_val) * np.random.random_sample() + min_val
+    return (max_val - min_val) * _rng.random() + min_val
 
 
 # noinspection PyUnusedLocal
@@ -876,7 +1024,7 @@ def trend_get_HR(in_data, **kwargs):
     c = np.square(b)  # square
     d = np.convolve(c, np.ones(10), "same")  # smooth
     # get RMS value to use in the peak detection algorithm
-    rms = np.sqrt(np.mean(np.square(d)))
+    rms = _rms(d)
     # print 'RMS value:', rms.EKG
     e_max, e_min = peakdet(d, rms)
 
@@ -903,7 +1051,7 @@ def trend_get_lastPeakValue(in_data, **kwargs):
         min_size = kwargs["peakSize"]
     else:
         # get RMS value to use in the peak detection algorithm
-        min_size = np.sqrt(np.mean(np.square(in_data)))
+        min_size = _rms(in_data)
     e_max, e_min = peakdet(in_data, min_size)
     if len(e_max) > 0:
         ret = e_max[-1, 1]
@@ -919,7 +1067,7 @@ def trend_get_avgPeakValue(in_data, **kwargs):
         min_size = kwargs["peakSize"]
     else:
         # get RMS value to use in the peak detection algorithm
-        min_size = np.sqrt(np.mean(np.square(in_data)))
+        min_size = _rms(in_data)
     e_max, e_min = peakdet(in_data, min_size)
     if len(e_max) > 0:
         ret = np.mean(e_max[:, 1])
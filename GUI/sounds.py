@@ -0,0 +1,58 @@
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    import pygame
+
+# pygame is only imported, and the sound mixer only opened, when the first alarm sound is needed (see _mixer())
+_pygame = None
+
+# decoded alarm sounds, keyed by absolute path, shared by all the alarms that use the same file
+_soundCache: typing.Dict[str, "pygame.mixer.Sound"] = {}
+
+
+def _mixer():
+    """
+    returns the pygame mixer module, importing pygame and initializing the mixer if it hasn't been already
+    """
+    global _pygame
+    if _pygame is None:
+        import pygame
+
+        _pygame = pygame
+    if _pygame.mixer.get_init() is None:
+        _pygame.mixer.pre_init(44100, -16, 2, 2048)
+        _pygame.mixer.init()
+    return _pygame.mixer
+
+
+def load_sound(path):
+    """
+    returns the pygame Sound object for the file at path, decoding the file only the first time it is requested
+    """
+    key = os.path.abspath(path)
+    sound = _soundCache.get(key)
+    if sound is None:
+        sound = _mixer().Sound(key)
+        _soundCache[key] = sound
+    return sound
+
+
+# number of mixer channels handed out by reserve_channel()
+_nbReservedChannels = 0
+
+
+def reserve_channel():
+    """
+    returns a mixer channel for the exclusive use of the caller. Reserved channels are never picked by
+    Sound.play(), so an alarm always has its own channel available and does not need to look for a free one.
+    Since a Sound can be shared, alarms must be played and stopped through their channel, not the Sound
+    """
+    global _nbReservedChannels
+    mixer = _mixer()
+    channel_id = _nbReservedChannels
+    _nbReservedChannels += 1
+    if mixer.get_num_channels() < _nbReservedChannels:
+        mixer.set_num_channels(_nbReservedChannels)
+    mixer.set_reserved(_nbReservedChannels)
+    return mixer.Channel(channel_id)
@@ -1,7 +1,10 @@
+import atexit
 import datetime
 import logging
 import os
+import queue
 import re
+import threading
 import typing
 from enum import IntEnum
 
@@ -12,6 +15,8 @@ logger = logging.getLogger(__name__)
 
 
 class Drug(object):
+    __slots__ = "_name", "_volume", "_dose", "_concentration", "_pump"
+
     def __init__(self, name="", volume=0, dose=0.0, concentration=0.0, pump=None):
         self._name = name
         self._volume = volume
@@ -62,6 +67,10 @@ class Drug(object):
     def as_list(self):
         return [self.name, self._dose, self._concentration, self._volume, self._pump]
 
+    def as_dict(self):
+        # same keys as the former instance __dict__, which is how drugs are stored in the previous values file
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
     def as_strings(self):
         pump = "Manual" if self.pump is None else f"Pump #{self.pump}"
         return [
@@ -198,6 +207,11 @@ Comments:
 
     def __init__(self, path, widget: QPlainTextEdit, nb_measurements):
         self._path = path
+        # the file is written from a background thread, so that a slow disk never blocks the GUI.
+        # The thread is started on the first write, and stopped by close(), which also runs at exit so that the
+        # lines still queued are written whichever way the program ends
+        self._queue = queue.SimpleQueue()
+        self._writer = None
         self.content = ""
         self.widget = widget
         self.nbMeasurements = nb_measurements
@@ -229,12 +243,48 @@ Comments:
     def append(self, text):
         text += "\n" if text[-1] != "\n" else ""  # ensure line ends with newline
         self.content += text
-        os.makedirs(os.path.dirname(self._path), exist_ok=True)
-        with open(self._path, "a+", encoding="utf-8") as f:
-            f.write(text)
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="LogBox writer", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+        self._queue.put(text)
         if self.widget is not None:
             self.widget.appendPlainText(text[:-1])  # dont include \n
 
+    def _write_loop(self):
+        file = None
+        while True:
+            # write everything that was appended since the last pass at once
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            text = "".join(item for item in items if item is not None)
+            if len(text) > 0:
+                try:
+                    if file is None:
+                        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                        file = open(self._path, "ab")
+                    file.write(text.encode("utf-8"))
+                    file.flush()
+                except OSError:
+                    logger.exception("could not write to the log file %s", self._path)
+            if None in items:
+                if file is not None:
+                    file.close()
+                return
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            atexit.unregister(self.close)
+
     @staticmethod
     def parse(path):
         with open(path, "r", encoding="utf-8") as f:
@@ -1114,6 +1114,116 @@ class Harvard11ElitePump(SyringePump):
         return self.UNITS
 
 
+class CachedPump(object):
+    """
+    Wraps a SyringePump and keeps the values read from it for CACHE_DURATION seconds, so that repeated queries
+    (from the GUI and the polling thread) do not each cost a serial round-trip. Values sent to the pump are cached
+    as soon as they are written. Everything else is forwarded to the wrapped pump.
+    """
+
+    CACHE_DURATION = 0.05  # in seconds
+
+    def __init__(self, pump: SyringePump):
+        self._pump = pump
+        self._cache = {}  # name of the getter -> (time of the reading, value)
+
+    def __getattr__(self, name):
+        return getattr(self._pump, name)
+
+    def __setattr__(self, name, value):
+        # public attributes (display_name, bolus_rate...) belong to the wrapped pump
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self._pump, name, value)
+
+    @property
+    def pump(self) -> SyringePump:
+        return self._pump
+
+    def _get(self, name):
+        now = time.monotonic()
+        entry = self._cache.get(name)
+        if entry is not None and now - entry[0] < self.CACHE_DURATION:
+            return entry[1]
+        value = getattr(self._pump, name)()
+        self._cache[name] = (now, value)
+        return value
+
+    def _set(self, name, value):
+        self._cache[name] = (time.monotonic(), value)
+
+    def _invalidate(self, *names):
+        for name in names:
+            self._cache.pop(name, None)
+
+    def start(self):
+        self._invalidate("is_running", "get_direction", "get_accumulated_volume_uL")
+        self._pump.start()
+        self._invalidate("is_running", "get_direction", "get_accumulated_volume_uL")
+
+    def stop(self):
+        self._invalidate("is_running", "get_direction", "get_accumulated_volume_uL")
+        self._pump.stop()
+        self._invalidate("is_running", "get_direction", "get_accumulated_volume_uL")
+
+    def reverse(self):
+        self._pump.reverse()
+        self._invalidate("get_direction")
+
+    def set_direction(self, value: int):
+        self._pump.set_direction(value)
+        self._invalidate("is_running", "get_direction")
+
+    def clear_accumulated_volume(self):
+        self._pump.clear_accumulated_volume()
+        self._invalidate("get_accumulated_volume_uL")
+
+    def clear_target_volume(self):
+        self._pump.clear_target_volume()
+        self._invalidate("get_target_volume_uL")
+
+    def set_syringe_diameter_mm(self, value: float):
+        self._pump.set_syringe_diameter_mm(value)
+        self._set("get_diameter_mm", value)
+
+    def set_rate(self, value: float, units: int):
+        self._pump.set_rate(value, units)
+        self._set("get_rate", value)
+        self._set("get_units", units)
+
+    def set_target_volume_uL(self, value: float):
+        self._pump.set_target_volume_uL(value)
+        self._invalidate("get_target_volume_uL")
+
+    def is_running(self):
+        return self._get("is_running")
+
+    def get_diameter_mm(self) -> float:
+        return self._get("get_diameter_mm")
+
+    def get_rate(self) -> float:
+        return self._get("get_rate")
+
+    def get_units(self) -> int:
+        return self._get("get_units")
+
+    def get_accumulated_volume_uL(self) -> float:
+        return self._get("get_accumulated_volume_uL")
+
+    def get_target_volume_uL(self) -> float:
+        return self._get("get_target_volume_uL")
+
+    def get_direction(self) -> SyringePump.STATE:
+        return self._get("get_direction")
+
+    def get_possible_units(self) -> list:
+        # the units a pump accepts never change
+        if "get_possible_units" not in self._cache:
+            self._cache["get_possible_units"] = (0.0, self._pump.get_possible_units())
+        return self._cache["get_possible_units"][1]
+
+
 AVAIL_PUMP_MODULES = {
     "dummy": DummyPump,
     "aladdin": AladdinPump,
@@ -17,7 +17,11 @@ class RollingBuffer(object):
     def __init__(self, size=100, nLines=1, fill=0.0):
         self._size = size
         self._nLines = nLines
-        self._buffer = np.full((nLines, size), fill, dtype=np.array(fill).dtype)
+        # every element is stored twice, at columns i and i + size, so that the last size elements are always
+        # available, in order, as a view of the ring. Nothing is moved when adding elements
+        self._ring = np.full((nLines, 2 * size), fill, dtype=np.array(fill).dtype)
+        self._index = 0  # column at which the next element is written
+        self._buffer = self._ring[:, :size]
 
     def append(self, items):
         # logging.debug('in RollingBuffer.append(). Items received are %s: %s', np.shape(items), items)
@@ -51,9 +55,20 @@ class RollingBuffer(object):
                 )
 
         # do the thing
+        items = items[:, -1 * self._size :]
         _, n = np.shape(items)
-        self._buffer = np.roll(self._buffer, -1 * n, 1)
-        self._buffer[:, -1 * n :] = items[:, -1 * self._size :]
+        end = self._index + n
+        if end <= self._size:
+            self._ring[:, self._index : end] = items
+            self._ring[:, self._index + self._size : end + self._size] = items
+        else:
+            split = self._size - self._index
+            self._ring[:, self._index : self._size] = items[:, :split]
+            self._ring[:, self._index + self._size :] = items[:, :split]
+            self._ring[:, : end - self._size] = items[:, split:]
+            self._ring[:, self._size : end] = items[:, split:]
+        self._index = end % self._size
+        self._buffer = self._ring[:, self._index : self._index + self._size]
 
     def __repr__(self):
         return self._buffer.__repr__()
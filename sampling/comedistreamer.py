@@ -102,7 +102,7 @@ class ComediStreamer(Streamer):
                 )
                 raise CmdComediError(comedi.comedi_strerror(comedi.comedi_errno()))
 
-        self._empty = np.empty((self.nbChannels,))
+        self._empty = np.empty((self.nbChannels, 0))
 
     def close(self):
         # logger.debug("in DemoStreamer.__del__()")
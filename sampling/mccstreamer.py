@@ -81,7 +81,7 @@ class MCCStreamer(Streamer):
         self._ai_device.a_in_load_queue(self._sorted_queue)
         self.__data = create_float_buffer(len(channels), self._buffer_size)
         self._last_index = 0
-        self._empty = np.empty(shape=(len(channels),))
+        self._empty = np.empty(shape=(len(channels), 0))
 
     def start(self):
         scan_options = ScanOption.DEFAULTIO | ScanOption.CONTINUOUS
@@ -48,6 +48,8 @@ class Streamer(object):
     def read(self):
         """
         :return: a numpy array of shape (number of channels, N) containing the data sampled since the last call.
+        Always returns a numpy array (or None), never a list: when there is no new data, return an array with N=0,
+        such as self._empty.
         """
         return self._empty
 
@@ -24,6 +24,7 @@ class SerialStreamer(Streamer):
         dsrdtr=False,
         inter_byte_timeout=None,
         genfromtxt_kws=None,
+        min_chunk_bytes=0,
     ):
         self._serial = serial.Serial(
             port,
@@ -40,6 +41,9 @@ class SerialStreamer(Streamer):
         )
         self._sampling_rate = sampling_rate
         self.__genfromtxt_kws = {} if genfromtxt_kws is None else genfromtxt_kws
+        # bytes are left in the serial port buffer until at least that many are waiting,
+        # so that small reads get coalesced into fewer, larger ones
+        self._min_chunk_bytes = min_chunk_bytes
         self.__paused = True
         self.start()
         self._remain = ""
@@ -47,7 +51,7 @@ class SerialStreamer(Streamer):
     def read(self):
         if not self.__paused:
             n = self._serial.in_waiting
-            if not n > 0:
+            if not n > 0 or n < self._min_chunk_bytes:
                 return self._empty
             # logger.debug(f"serial {self._serial.port} has {n} bytes in waiting")
             lines = self._serial.read(n).decode("ascii")